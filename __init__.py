@@ -20,7 +20,11 @@ from .bp_ops import (
     SetReferencePoint,
     AlignAxisByPoints,
     BakeBPPhysics,
+    BP_AddBatchAction,
+    BP_RemoveBatchAction,
+    BakeBPBatchPhysics,
     BakeBPRootMotion,
+    FillBPComCache,
     BP_AddControlBones,
     BP_DeleteControlBone,
     BP_RootSetRelativeZ,
@@ -30,7 +34,9 @@ from .bp_ops import (
     SetStartingPointToCOM,
     SetReferencePointToCOM,
     CalculateBPMotionPath,
+    UpdateBPMotionPath,
     ClearBPMotionPath,
+    ExportBPAnalysis,
 )
 from .mass_ops import (
     AddMassProps,
@@ -51,6 +57,7 @@ from .ui import (
     BP_PT_MassPropertyEditor,
     BP_PT_BallisticsRuler,
     BP_PT_Baking,
+    BP_PT_BatchBaking,
     BP_PT_Motion_Path,
     BP_PT_Root_Motion,
     BP_PT_MassSelected,
@@ -59,10 +66,23 @@ from .props import (
     BP_MotionPathPoint,
     BP_RootControlBones,
     BP_MassCollections,
+    BP_BatchAction,
     BPMassObjectGroup,
     BPComProperties,
 )
-from .center_of_mass import update_mass_group_com
+from .center_of_mass import (
+    update_mass_group_com,
+    update_mass_group_com_frame,
+    clear_com_keys,
+)
+from .mass_index import update_mass_index, clear_mass_index
+from .com_cache import clear_com_timelines
+from .samples import clear_transform_samples, clear_fingerprints
+from .motion_path import (
+    migrate_motion_paths,
+    update_motion_paths,
+    refresh_motion_path_watch,
+)
 import bpy
 bl_info = {
     "name": "Balance Point",
@@ -87,6 +107,7 @@ classes = (
     BP_MotionPathPoint,
     BP_MassCollections,
     BP_RootControlBones,
+    BP_BatchAction,
     BPMassObjectGroup,
     BPComProperties,
     BP_UL_List,
@@ -99,6 +120,7 @@ classes = (
     BP_PT_RotationAxis,
     BP_PT_BallisticsRuler,
     BP_PT_Baking,
+    BP_PT_BatchBaking,
     BP_PT_MassPropertyEditor,
     BP_PT_MassSelected,
     AddMassObjectGroup,
@@ -115,7 +137,11 @@ classes = (
     AlignAxisByPoints,
     AlignAxisByCursorRef,
     BakeBPPhysics,
+    BP_AddBatchAction,
+    BP_RemoveBatchAction,
+    BakeBPBatchPhysics,
     BakeBPRootMotion,
+    FillBPComCache,
     BP_RootSetRelativeZ,
     BP_AddControlBones,
     BP_DeleteControlBone,
@@ -123,7 +149,9 @@ classes = (
     SetStartingPointToCOM,
     SetReferencePointToCOM,
     CalculateBPMotionPath,
+    UpdateBPMotionPath,
     ClearBPMotionPath,
+    ExportBPAnalysis,
 )
 
 
@@ -140,8 +168,27 @@ def register():
 
     global draw_handler
 
+    bpy.app.handlers.depsgraph_update_post.append(update_mass_index)
     bpy.app.handlers.depsgraph_update_post.append(update_mass_group_com)
-    bpy.app.handlers.frame_change_post.append(update_mass_group_com)
+    bpy.app.handlers.depsgraph_update_post.append(update_motion_paths)
+    bpy.app.handlers.depsgraph_update_post.append(clear_fingerprints)
+    bpy.app.handlers.frame_change_post.append(update_mass_group_com_frame)
+    bpy.app.handlers.load_post.append(clear_mass_index)
+    bpy.app.handlers.load_post.append(clear_com_keys)
+    bpy.app.handlers.load_post.append(clear_com_timelines)
+    bpy.app.handlers.load_post.append(clear_transform_samples)
+    bpy.app.handlers.load_post.append(migrate_motion_paths)
+    bpy.app.handlers.load_post.append(refresh_motion_path_watch)
+    bpy.app.handlers.undo_post.append(clear_mass_index)
+    bpy.app.handlers.undo_post.append(clear_com_keys)
+    bpy.app.handlers.undo_post.append(clear_com_timelines)
+    bpy.app.handlers.undo_post.append(clear_transform_samples)
+    bpy.app.handlers.undo_post.append(refresh_motion_path_watch)
+    bpy.app.handlers.redo_post.append(clear_mass_index)
+    bpy.app.handlers.redo_post.append(clear_com_keys)
+    bpy.app.handlers.redo_post.append(clear_com_timelines)
+    bpy.app.handlers.redo_post.append(clear_transform_samples)
+    bpy.app.handlers.redo_post.append(refresh_motion_path_watch)
     draw_handler = bpy.types.SpaceView3D.draw_handler_add(
         draw_bp, (None, None), 'WINDOW', 'POST_VIEW')
 
@@ -156,8 +203,27 @@ def unregister():
 
     global draw_handler
 
+    bpy.app.handlers.depsgraph_update_post.remove(update_mass_index)
     bpy.app.handlers.depsgraph_update_post.remove(update_mass_group_com)
-    bpy.app.handlers.frame_change_post.remove(update_mass_group_com)
+    bpy.app.handlers.depsgraph_update_post.remove(update_motion_paths)
+    bpy.app.handlers.depsgraph_update_post.remove(clear_fingerprints)
+    bpy.app.handlers.frame_change_post.remove(update_mass_group_com_frame)
+    bpy.app.handlers.load_post.remove(clear_mass_index)
+    bpy.app.handlers.load_post.remove(clear_com_keys)
+    bpy.app.handlers.load_post.remove(clear_com_timelines)
+    bpy.app.handlers.load_post.remove(clear_transform_samples)
+    bpy.app.handlers.load_post.remove(migrate_motion_paths)
+    bpy.app.handlers.load_post.remove(refresh_motion_path_watch)
+    bpy.app.handlers.undo_post.remove(clear_mass_index)
+    bpy.app.handlers.undo_post.remove(clear_com_keys)
+    bpy.app.handlers.undo_post.remove(clear_com_timelines)
+    bpy.app.handlers.undo_post.remove(clear_transform_samples)
+    bpy.app.handlers.undo_post.remove(refresh_motion_path_watch)
+    bpy.app.handlers.redo_post.remove(clear_mass_index)
+    bpy.app.handlers.redo_post.remove(clear_com_keys)
+    bpy.app.handlers.redo_post.remove(clear_com_timelines)
+    bpy.app.handlers.redo_post.remove(clear_transform_samples)
+    bpy.app.handlers.redo_post.remove(refresh_motion_path_watch)
     bpy.types.SpaceView3D.draw_handler_remove(draw_handler, 'WINDOW')
 
 
@@ -0,0 +1,580 @@
+import numpy as np
+from collections import namedtuple
+from math import radians, pi
+from mathutils import Vector, Matrix, Quaternion
+from .keyframes import (
+    write_bone_keys,
+    get_action_state,
+    set_action,
+    get_rotation_data_path,
+    get_rotation_values,
+)
+from .mass_index import get_mass_index
+from .samples import clear_fingerprints
+from .utils import MassSnapshot, BallisticTrajectory
+
+
+PhysicsBakeResult = namedtuple("PhysicsBakeResult", (
+    "frames",
+    "rotations",
+    "locations",
+    "substeps",
+))
+
+# Upper bound on adaptive substeps per frame
+MAX_ADAPTIVE_SUBSTEPS = 1000
+
+# Fixed-point iterations of the implicit midpoint step
+IMPLICIT_ITERATIONS = 20
+IMPLICIT_TOLERANCE = 1e-12
+
+
+class PhysicsBakeSamples:
+    """Per-frame transforms and settings needed to solve a physics bake without the scene.
+
+    Mass objects are assumed to follow the root bone, so the effect of a new
+    root rotation on their positions can be predicted from the samples.
+    """
+
+    def __init__(self, group):
+        index = get_mass_index(group)
+
+        self.rig = group.pinned_rig
+        self.root_bone = group.root_bone
+        self.frames = np.arange(group.frame_start, group.frame_end + 1)
+        self.masses = index.masses.copy()
+        self.radii = index.radii.copy()
+        self.enable_rotation = group.enable_ballistics_rotation
+        self.initial_axis = tuple(group.initial_axis)
+        self.initial_angular_velocity = group.initial_angular_velocity
+        self.frame_rate = float(group.frame_rate)
+        self.substeps = group.substeps
+        self.integrator = group.integrator
+        self.adaptive_substeps = group.adaptive_substeps
+        self.substep_tolerance = group.substep_tolerance
+        self.trajectory = BallisticTrajectory(
+            group.ballistics_starting_point, group.reference_point, group.gravity, group.time_of_flight, group.damp_vector)
+
+        frame_count = len(self.frames)
+        self.positions = np.zeros((frame_count, len(index), 3))
+        self.root_matrices = np.zeros((frame_count, 4, 4))
+        self.root_rotations = np.zeros((frame_count, 4))
+        self.root_locations = np.zeros((frame_count, 3))
+        self.rig_matrices = np.zeros((frame_count, 4, 4))
+        self._index = index
+
+    def __len__(self):
+        return len(self.frames)
+
+    def load(self, transforms):
+        """Fill every frame from shared transform samples taken with bones."""
+        rows = transforms.rows(self.frames)
+        bone = transforms.bone_names.index(self.root_bone)
+
+        self.positions[:] = transforms.positions[rows]
+        self.root_matrices[:] = transforms.bone_matrices[rows, bone]
+        self.root_rotations[:] = transforms.bone_channels["rotation_quaternion"][rows, bone]
+        self.root_locations[:] = transforms.bone_channels["location"][rows, bone]
+        self.rig_matrices[:] = transforms.rig_matrices[rows]
+
+    def sample(self, frame):
+        i = frame - self.frames[0]
+        root_bone = self.rig.pose.bones[self.root_bone]
+
+        self.positions[i] = self._index.positions()
+        self.root_matrices[i] = root_bone.matrix
+        self.root_rotations[i] = root_bone.rotation_quaternion
+        self.root_locations[i] = root_bone.location
+        self.rig_matrices[i] = self.rig.matrix_world
+
+
+def iter_physics_bake_samples(scene, samples):
+    for index, frame in enumerate(samples.frames):
+        scene.frame_set(int(frame))
+        samples.sample(frame)
+        yield index + 1, len(samples)
+
+
+def sample_physics_bake(scene, group):
+    samples = PhysicsBakeSamples(group)
+
+    for _ in iter_physics_bake_samples(scene, samples):
+        pass
+
+    return samples
+
+
+def solve_physics_bake(samples):
+    frame_count = len(samples)
+    rotations = np.zeros((frame_count, 4))
+    locations = np.zeros((frame_count, 3))
+
+    dt_frame = 1.0 / samples.frame_rate
+    dt_sub = dt_frame / samples.substeps
+
+    start_props = MassSnapshot(samples.masses, samples.positions[0], samples.radii).mass_properties()
+    initial_angular_velocity = Vector(samples.initial_axis).normalized() * radians(samples.initial_angular_velocity)
+    momentum_vector = start_props.inertia_tensor @ initial_angular_velocity
+    accumulated_rotation = Matrix(samples.root_matrices[0].tolist()).to_quaternion()
+
+    step = INTEGRATORS[samples.integrator]
+    dt_adaptive = dt_sub
+    total_substeps = 0
+
+    ballistic_positions = samples.trajectory.positions((samples.frames - samples.frames[0]) / samples.frame_rate)
+    prev_local_rel_pos = None
+
+    for i in range(frame_count):
+        root_matrix = Matrix(samples.root_matrices[i].tolist())
+        rig_matrix = Matrix(samples.rig_matrices[i].tolist())
+        frame_props = MassSnapshot(samples.masses, samples.positions[i], samples.radii).mass_properties()
+        com = frame_props.com
+
+        if samples.enable_rotation:
+            # Mass positions relative to the COM in the root's frame at sample time
+            R_inv_sample = root_matrix.to_quaternion().inverted().to_matrix()
+            local_rel_pos = (samples.positions[i] - np.array(com)) @ np.array(R_inv_sample).T
+
+            # Internal Angular Momentum
+            L_int_local = Vector((0.0, 0.0, 0.0))
+
+            if i > 0:
+                v_local = (local_rel_pos - prev_local_rel_pos) / dt_frame
+                L_int_local = Vector((samples.masses @ np.cross(local_rel_pos, v_local)).tolist())
+
+            prev_local_rel_pos = local_rel_pos
+
+            # Rotation
+            I_body = R_inv_sample @ frame_props.inertia_tensor @ R_inv_sample.transposed()
+            I_inv_body = I_body.inverted_safe()
+
+            R_start = accumulated_rotation.to_matrix()
+            L_int_world = R_start @ L_int_local
+
+            # Subtract internal momentum from the total conserved momentum
+            effective_momentum = momentum_vector - L_int_world
+
+            # Rotation substeps
+            if i > 0 and samples.adaptive_substeps:
+                accumulated_rotation, frame_substeps, dt_adaptive = integrate_adaptive(
+                    accumulated_rotation, samples.integrator, I_inv_body, effective_momentum, dt_frame, dt_adaptive, samples.substep_tolerance)
+                total_substeps += frame_substeps
+            elif i > 0:
+                for _ in range(samples.substeps):
+                    accumulated_rotation = step(accumulated_rotation, I_inv_body, effective_momentum, dt_sub)
+                total_substeps += samples.substeps
+
+            rotations[i] = accumulated_rotation
+
+            # Move the sampled COM along with the root's new rotation
+            sample_rotation = Quaternion(samples.root_rotations[i].tolist())
+            pose_rotation = root_matrix.to_3x3().normalized()
+            delta = pose_rotation @ (sample_rotation.inverted() @ accumulated_rotation).to_matrix() @ pose_rotation.inverted()
+
+            rig_rotation = rig_matrix.to_3x3()
+            pivot = rig_matrix @ root_matrix.translation
+            com = pivot + (rig_rotation @ delta @ rig_rotation.inverted_safe()) @ (com - pivot)
+
+        # Ballistics
+        location = Vector(samples.root_locations[i].tolist())
+        difference = com - Vector(ballistic_positions[i].tolist())
+        if difference.length > 0.00001:
+            location -= rig_matrix.inverted().to_3x3() @ difference
+
+        locations[i] = location
+
+    return PhysicsBakeResult(samples.frames.copy(), rotations, locations, total_substeps)
+
+
+# Rotation Integrators
+
+
+def get_angular_velocity(rotation, I_inv_body, momentum):
+    R = rotation.to_matrix()
+    return R @ (I_inv_body @ (R.transposed() @ momentum))
+
+
+def rotate_by(rotation, angular_velocity, dt):
+    rotation_angle = angular_velocity.length * dt
+    if rotation_angle <= 1e-6:
+        return rotation
+
+    rot_step = Quaternion(angular_velocity.normalized(), rotation_angle)
+    rotation = rot_step @ rotation
+    rotation.normalize()
+    return rotation
+
+
+def step_euler(rotation, I_inv_body, momentum, dt):
+    return rotate_by(rotation, get_angular_velocity(rotation, I_inv_body, momentum), dt)
+
+
+def step_rk4(rotation, I_inv_body, momentum, dt):
+    def derivative(q):
+        angular_velocity = get_angular_velocity(q.normalized(), I_inv_body, momentum)
+        return (Quaternion((0.0, *angular_velocity)) @ q) * 0.5
+
+    k1 = derivative(rotation)
+    k2 = derivative(rotation + k1 * (dt / 2))
+    k3 = derivative(rotation + k2 * (dt / 2))
+    k4 = derivative(rotation + k3 * dt)
+
+    rotation = rotation + (k1 + k2 * 2.0 + k3 * 2.0 + k4) * (dt / 6)
+    rotation.normalize()
+    return rotation
+
+
+def step_lie_midpoint(rotation, I_inv_body, momentum, dt):
+    # Explicit midpoint step along the rotation group. The world angular
+    # momentum is held constant by every integrator here; with this step the
+    # rotational kinetic energy drifts with second-order error.
+    half_rotation = rotate_by(rotation, get_angular_velocity(rotation, I_inv_body, momentum), dt / 2)
+    return rotate_by(rotation, get_angular_velocity(half_rotation, I_inv_body, momentum), dt)
+
+
+def step_implicit_midpoint(rotation, I_inv_body, momentum, dt):
+    """Implicit midpoint step on the rotation group, using the Cayley map.
+
+    Solves for the body angular momentum at the end of the step by
+    fixed-point iteration of the midpoint rule, then rotates by the Cayley
+    transform of the midpoint angular velocity. The midpoint rule conserves
+    quadratic invariants, so the rotational kinetic energy is conserved up
+    to the solver tolerance, and the rotated body momentum still matches
+    the world angular momentum.
+    """
+    body_momentum = rotation.to_matrix().transposed() @ momentum
+    next_momentum = body_momentum.copy()
+    tolerance = IMPLICIT_TOLERANCE * max(body_momentum.length, 1e-12)
+
+    for _ in range(IMPLICIT_ITERATIONS):
+        angular_velocity = I_inv_body @ ((body_momentum + next_momentum) * 0.5)
+
+        # Cayley transform of the body angular velocity over the step
+        cayley = Quaternion((1.0, *(angular_velocity * (dt / 2))))
+        cayley.normalize()
+
+        previous_momentum = next_momentum
+        next_momentum = cayley.to_matrix().transposed() @ body_momentum
+        if (next_momentum - previous_momentum).length <= tolerance:
+            break
+
+    rotation = rotation @ cayley
+    rotation.normalize()
+    return rotation
+
+
+INTEGRATORS = {
+    'EULER': step_euler,
+    'RK4': step_rk4,
+    'LIE_MIDPOINT': step_lie_midpoint,
+    'IMPLICIT_MIDPOINT': step_implicit_midpoint,
+}
+
+INTEGRATOR_ORDERS = {
+    'EULER': 1,
+    'RK4': 4,
+    'LIE_MIDPOINT': 2,
+    'IMPLICIT_MIDPOINT': 2,
+}
+
+
+def integrate_adaptive(rotation, integrator, I_inv_body, momentum, dt_frame, dt_initial, tolerance):
+    """Advance rotation by one frame, choosing substeps by step doubling.
+
+    Each substep is compared against two half substeps; the angle between
+    the results is the error estimate that grows or shrinks the next step.
+    Returns the new rotation, the integrator steps attempted, including
+    those of rejected trials, and the step size to start the next frame
+    with: the last accepted step that was not clipped to the frame's end.
+    """
+    step = INTEGRATORS[integrator]
+    order = INTEGRATOR_ORDERS[integrator]
+    dt_min = dt_frame / MAX_ADAPTIVE_SUBSTEPS
+
+    elapsed = 0.0
+    dt = min(max(dt_initial, dt_min), dt_frame)
+    dt_next = dt
+    substeps = 0
+
+    while dt_frame - elapsed > dt_min * 1e-3:
+        dt_trial = min(dt, dt_frame - elapsed)
+
+        full_step = step(rotation, I_inv_body, momentum, dt_trial)
+        half_step = step(rotation, I_inv_body, momentum, dt_trial / 2)
+        half_step = step(half_step, I_inv_body, momentum, dt_trial / 2)
+        substeps += 3
+
+        error = full_step.rotation_difference(half_step).angle
+        error = min(error, 2 * pi - error)
+
+        if error <= tolerance or dt_trial <= dt_min:
+            rotation = half_step
+            elapsed += dt_trial
+            if dt_trial == dt:
+                dt_next = dt
+
+        if error > 0.0:
+            scale = 0.9 * (tolerance / error) ** (1 / (order + 1))
+        else:
+            scale = 2.0
+        dt = max(dt_min, dt_trial * min(2.0, max(0.2, scale)))
+
+    return rotation, substeps, dt_next
+
+
+def write_physics_bake(group, result):
+    rig = group.pinned_rig
+    root_bone = rig.pose.bones[group.root_bone]
+
+    if group.enable_ballistics_rotation:
+        write_bone_keys(rig, root_bone, "rotation_quaternion", result.frames, result.rotations)
+    write_bone_keys(rig, root_bone, "location", result.frames, result.locations)
+
+    # The new keys change the fingerprint of every group using the rig, and
+    # scripted runs get no depsgraph update before the next operator
+    clear_fingerprints()
+
+
+class RootMotionSamples:
+    """Per-frame COM targets and pose matrices needed to solve a root motion bake without the scene."""
+
+    def __init__(self, group):
+        rig = group.pinned_rig
+
+        self.rig = rig
+        self.root_bone = group.root_bone
+        self.frames = np.arange(group.root_motion_frame_start, group.root_motion_frame_end + 1)
+        self.control_bones = [
+            cb.control_bone for cb in group.root_control_bones
+            if cb.control_bone in rig.pose.bones and cb.control_bone != group.root_bone]
+        self.clear_rotation = group.root_bake_clear_rotation
+        self.relative = group.root_bake_relative
+        self.relative_offset = np.array(group.root_bake_relative_xyz)
+        self.limit = np.array(group.root_limit_xyz)
+        self.track = np.array(group.root_track_xyz, dtype=bool)
+
+        # The root, the control bones and their ancestors
+        self.bone_names = []
+        for name in [self.root_bone] + self.control_bones:
+            bone = rig.data.bones[name]
+            while bone is not None and bone.name not in self.bone_names:
+                self.bone_names.append(bone.name)
+                bone = bone.parent
+
+        bone_lookup = {pose_bone.name: index for index, pose_bone in enumerate(rig.pose.bones)}
+        self.bone_indices = np.array([bone_lookup[name] for name in self.bone_names])
+
+        frame_count = len(self.frames)
+        self.root_targets = np.zeros((frame_count, 3))
+        self.pose_matrices = np.zeros((frame_count, len(self.bone_names), 4, 4))
+        self.rotations = {
+            name: np.zeros((frame_count, len(getattr(rig.pose.bones[name], get_rotation_data_path(rig.pose.bones[name])))))
+            for name in self.control_bones}
+        self._index = get_mass_index(group)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get_targets(self, coms):
+        if self.relative:
+            return coms + self.relative_offset
+        return np.where(self.track, coms, self.limit)
+
+    def load(self, transforms):
+        """Fill every frame from shared transform samples taken with bones."""
+        rows = transforms.rows(self.frames)
+
+        # Root targets in armature space
+        targets = self.get_targets(transforms.coms(self.frames, self._index.masses))
+        rig_inverses = np.linalg.inv(transforms.rig_matrices[rows])
+        self.root_targets[:] = np.einsum('fij,fj->fi', rig_inverses[:, :3, :3], targets) + rig_inverses[:, :3, 3]
+
+        self.pose_matrices[:] = transforms.bone_matrices[rows][:, self.bone_indices]
+
+        for name, rotations in self.rotations.items():
+            bone = transforms.bone_names.index(name)
+            rotations[:] = transforms.bone_channels[get_rotation_data_path(self.rig.pose.bones[name])][rows, bone]
+
+    def sample(self, frame):
+        i = frame - self.frames[0]
+        rig = self.rig
+        pose_bones = rig.pose.bones
+
+        # Root target in armature space
+        com = np.array(MassSnapshot(self._index.masses, self._index.positions(), self._index.radii).com())
+        target = self.get_targets(com)
+        self.root_targets[i] = rig.matrix_world.inverted() @ Vector(target.tolist())
+
+        # Flat matrices are column-major
+        matrices = np.empty(len(pose_bones) * 16, dtype=np.float32)
+        pose_bones.foreach_get("matrix", matrices)
+        self.pose_matrices[i] = matrices.reshape(-1, 4, 4).transpose(0, 2, 1)[self.bone_indices]
+
+        for name, rotations in self.rotations.items():
+            pose_bone = pose_bones[name]
+            rotations[i] = getattr(pose_bone, get_rotation_data_path(pose_bone))
+
+
+def solve_root_motion(samples):
+    """Key values for the root and control bones, with every control bone kept at its sampled pose.
+
+    Moving the root is propagated down the rest hierarchy with each bone's
+    own inheritance settings, so no frame has to be evaluated again.
+    Constraints below the root are not re-evaluated.
+    """
+    bones = samples.rig.data.bones
+    pose_bones = samples.rig.pose.bones
+    root = bones[samples.root_bone]
+    keys = {(samples.root_bone, "location"): []}
+    if samples.clear_rotation:
+        keys[(samples.root_bone, "rotation_quaternion")] = []
+    for name in samples.control_bones:
+        for data_path in ("location", "scale", get_rotation_data_path(pose_bones[name])):
+            keys[(name, data_path)] = []
+
+    def to_basis(bone, pose_matrix, poses):
+        if bone.parent is None:
+            return bone.convert_local_to_pose(pose_matrix, bone.matrix_local, invert=True)
+        return bone.convert_local_to_pose(
+            pose_matrix, bone.matrix_local, parent_matrix=poses[bone.parent.name], parent_matrix_local=bone.parent.matrix_local, invert=True)
+
+    def to_pose(bone, basis, poses):
+        if bone.parent is None:
+            return bone.convert_local_to_pose(basis, bone.matrix_local)
+        return bone.convert_local_to_pose(
+            basis, bone.matrix_local, parent_matrix=poses[bone.parent.name], parent_matrix_local=bone.parent.matrix_local)
+
+    for i in range(len(samples)):
+        old_poses = {name: Matrix(samples.pose_matrices[i, j].tolist()) for j, name in enumerate(samples.bone_names)}
+
+        # New root pose
+        root_pose = old_poses[root.name].copy()
+        root_pose.translation = Vector(samples.root_targets[i].tolist())
+        location, _, scale = to_basis(root, root_pose, old_poses).decompose()
+        if samples.clear_rotation:
+            root_pose = to_pose(root, Matrix.LocRotScale(location, None, scale), old_poses)
+            keys[(root.name, "rotation_quaternion")].append((1.0, 0.0, 0.0, 0.0))
+        keys[(root.name, "location")].append(tuple(location))
+
+        # Control bones keep their sampled pose
+        new_poses = {name: old_poses[name] for name in samples.control_bones}
+        new_poses[root.name] = root_pose
+
+        def get_new_pose(bone):
+            if bone.name not in new_poses:
+                if bone.parent is None:
+                    new_poses[bone.name] = old_poses[bone.name]
+                else:
+                    basis = to_basis(bone, old_poses[bone.name], old_poses)
+                    get_new_pose(bone.parent)
+                    new_poses[bone.name] = to_pose(bone, basis, new_poses)
+            return new_poses[bone.name]
+
+        for name in samples.control_bones:
+            bone = bones[name]
+            if bone.parent is not None:
+                get_new_pose(bone.parent)
+
+            location, rotation, scale = to_basis(bone, old_poses[name], new_poses).decompose()
+            rotation_path = get_rotation_data_path(pose_bones[name])
+            keys[(name, "location")].append(tuple(location))
+            keys[(name, "scale")].append(tuple(scale))
+            keys[(name, rotation_path)].append(
+                get_rotation_values(pose_bones[name].rotation_mode, rotation, samples.rotations[name][i]))
+
+    return keys
+
+
+def write_root_motion(samples, keys):
+    rig = samples.rig
+
+    for (bone_name, data_path), values in keys.items():
+        write_bone_keys(rig, rig.pose.bones[bone_name], data_path, samples.frames, values)
+
+    clear_fingerprints()
+
+
+class BatchBakePass:
+    """Groups sampled together in one sweep of the timeline, and the action each rig plays during it."""
+
+    def __init__(self):
+        self.actions = {}
+        self.bakes = []
+
+    def accepts(self, group, action):
+        rig = group.pinned_rig
+        if any(baked_group == group for baked_group, _ in self.bakes):
+            return False
+
+        bound = self.actions.get(rig.name)
+        return bound is None or bound[1] == action
+
+    def add(self, group, action):
+        self.actions[group.pinned_rig.name] = (group.pinned_rig, action)
+        self.bakes.append((group, PhysicsBakeSamples(group)))
+
+    @property
+    def frames(self):
+        frame_start = min(samples.frames[0] for _, samples in self.bakes)
+        frame_end = max(samples.frames[-1] for _, samples in self.bakes)
+        return np.arange(frame_start, frame_end + 1)
+
+    def assign_actions(self):
+        for rig, action in self.actions.values():
+            if action is not None:
+                set_action(rig, action)
+
+    def sample(self, frame):
+        for _, samples in self.bakes:
+            if samples.frames[0] <= frame <= samples.frames[-1]:
+                samples.sample(frame)
+
+
+def get_batch_groups(scene):
+    return [
+        group for group in scene.bp_mass_object_groups
+        if group.batch_bake and group.pinned_rig is not None and group.pinned_rig.type == 'ARMATURE'
+        and group.root_bone in group.pinned_rig.pose.bones
+        and group.frame_end > group.frame_start]
+
+
+def plan_batch_passes(groups):
+    """Split (group, action) bakes into as few timeline sweeps as possible.
+
+    A group without batch actions bakes its rig's current action. A pass can
+    hold each group once, and each rig playing one action.
+    """
+    passes = []
+
+    for group in groups:
+        actions = [item.action for item in group.batch_actions if item.action is not None]
+        if not actions:
+            actions = [get_action_state(group.pinned_rig)[0]]
+
+        for action in actions:
+            bake_pass = next((p for p in passes if p.accepts(group, action)), None)
+            if bake_pass is None:
+                bake_pass = BatchBakePass()
+                passes.append(bake_pass)
+            bake_pass.add(group, action)
+
+    return passes
+
+
+def get_rig_action_states(passes):
+    return {rig.name: (rig, get_action_state(rig)) for bake_pass in passes for rig, _ in bake_pass.actions.values()}
+
+
+def restore_rig_action_states(states):
+    for rig, (action, slot) in states.values():
+        if rig.animation_data is not None:
+            set_action(rig, action, slot)
+
+
+def bake_physics_dry_run(scene, group):
+    original_frame = scene.frame_current
+
+    samples = sample_physics_bake(scene, group)
+    scene.frame_set(original_frame)
+
+    return solve_physics_bake(samples)
@@ -1,13 +1,38 @@
 import bpy
-from math import radians
+import json
+import numpy as np
 from .utils import (
     is_valid_triangle,
     get_triangle_normal,
-    get_inertia_tensor,
-    projectile_position_linear,
-    get_com
+    compute_mass_properties,
+    MassSnapshot,
+)
+from .bake import (
+    PhysicsBakeSamples,
+    solve_physics_bake,
+    write_physics_bake,
+    get_batch_groups,
+    plan_batch_passes,
+    get_rig_action_states,
+    restore_rig_action_states,
+    RootMotionSamples,
+    solve_root_motion,
+    write_root_motion,
+)
+from .jobs import BP_ModalFrameJob
+from .com_cache import get_cached_groups, iter_fill_com_timelines
+from .mass_index import get_mass_index
+from .samples import get_transform_samples, iter_transform_samples
+from .motion_path import (
+    has_motion_path,
+    get_motion_path_points,
+    get_motion_path_frames,
+    set_motion_path,
+    clear_motion_path,
+    migrate_motion_path,
+    get_pending_indices,
+    resolve_pending_indices,
 )
-from mathutils import Vector, Quaternion
 
 
 class BP_AddMassCollection(bpy.types.Operator):
@@ -120,7 +145,7 @@ class SetReferencePointToCOM(bpy.types.Operator):
         selected_index = context.scene.bp_group_index
         sel_mog = context.scene.bp_mass_object_groups[selected_index]
 
-        sel_mog.reference_point = get_com(sel_mog)
+        sel_mog.reference_point = compute_mass_properties(sel_mog).com
 
         bpy.context.region.tag_redraw()
         return {'FINISHED'}
@@ -165,7 +190,7 @@ class SetStartingPointToCOM(bpy.types.Operator):
         selected_index = context.scene.bp_group_index
         sel_mog = context.scene.bp_mass_object_groups[selected_index]
 
-        sel_mog.ballistics_starting_point = get_com(sel_mog)
+        sel_mog.ballistics_starting_point = compute_mass_properties(sel_mog).com
 
         bpy.context.region.tag_redraw()
         return {'FINISHED'}
@@ -185,7 +210,7 @@ class AlignAxisByPoints(bpy.types.Operator):
 
     def execute(self, context):
         sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
-        rig_com = get_com(sel_mog)
+        rig_com = compute_mass_properties(sel_mog).com
 
         p1 = sel_mog.reference_point
         p2 = [sel_mog.reference_point[0], sel_mog.reference_point[1],
@@ -216,7 +241,7 @@ class AlignAxisByCursor(bpy.types.Operator):
 
     def execute(self, context):
         sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
-        rig_com = get_com(sel_mog)
+        rig_com = compute_mass_properties(sel_mog).com
         cursor = context.scene.cursor.location
 
         p1 = cursor
@@ -247,7 +272,7 @@ class AlignAxisByCursorRef(bpy.types.Operator):
 
     def execute(self, context):
         sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
-        rig_com = get_com(sel_mog)
+        rig_com = compute_mass_properties(sel_mog).com
         cursor = context.scene.cursor.location
 
         p1 = cursor
@@ -264,7 +289,7 @@ class AlignAxisByCursorRef(bpy.types.Operator):
         return {'FINISHED'}
 
 
-class BakeBPPhysics(bpy.types.Operator):
+class BakeBPPhysics(BP_ModalFrameJob, bpy.types.Operator):
     """Bakes the rotation and ballistics curve for the given range."""
     bl_idname = "balance_point.bake_physics"
     bl_label = "Bake Physics"
@@ -283,126 +308,119 @@ class BakeBPPhysics(bpy.types.Operator):
 
         return True
 
-    def execute(self, context):
+    def job_start(self, context):
+        # For returning to original frame after operation
+        super().job_start(context)
+
         selected_index = context.scene.bp_group_index
-        sel_mog = context.scene.bp_mass_object_groups[selected_index]
-        root_bone = sel_mog.pinned_rig.pose.bones[sel_mog.root_bone]
+        self.sel_mog = context.scene.bp_mass_object_groups[selected_index]
+        self.samples = PhysicsBakeSamples(self.sel_mog)
+        self.transforms = get_transform_samples(
+            self.sel_mog, self.sel_mog.frame_start, self.sel_mog.frame_end, include_bones=True)
+
+    def job_steps(self, context):
+        # Sample the frames not already sampled for this animation
+        return iter_transform_samples(
+            context.scene, self.transforms, self.transforms.missing_frames(self.sel_mog.frame_start, self.sel_mog.frame_end))
+
+    def job_finish(self, context):
+        # Solve in memory, then write keys
+        self.samples.load(self.transforms)
+        result = solve_physics_bake(self.samples)
+        write_physics_bake(self.sel_mog, result)
 
-        # For returning to original frame after operation
-        original_frame = bpy.context.scene.frame_current
+        # Return to original state
+        context.scene.frame_set(self.original_frame)
 
-        # Delete old keyframes
-        for f in range(sel_mog.frame_start + 1, sel_mog.frame_end + 1):
-            bpy.context.scene.frame_set(f)
-            root_bone.keyframe_delete(data_path="rotation_quaternion", frame = f)
+        if self.sel_mog.enable_ballistics_rotation:
+            self.report({'INFO'}, "Baked rotation with {} substeps.".format(result.substeps))
+        return {'FINISHED'}
 
-        bpy.context.scene.frame_set(sel_mog.frame_start)
-        context.view_layer.update()
 
-        com_start = get_com(sel_mog)
-        starting_inertia = get_inertia_tensor(sel_mog, com_start)
+class BP_AddBatchAction(bpy.types.Operator):
+    """Add new Batch Action to Current Mass Object Group."""
+    bl_idname = "balance_point.batch_action_add"
+    bl_label = "Add New Batch Action"
 
-        initial_angular_velocity = Vector(sel_mog.initial_axis).normalized() * radians(sel_mog.initial_angular_velocity)
-        momentum_vector = starting_inertia @ initial_angular_velocity
-        accumulated_rotation = root_bone.matrix.to_quaternion()
+    def execute(self, context):
+        sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
+        sel_mog.batch_actions.add()
+        return {'FINISHED'}
 
-        # Cache initial mass data
-        mass_obj_data = []
-        for mc in sel_mog.mass_collections:
-            if mc.mass_object_collection:
-                for obj in mc.mass_object_collection.objects:
-                    density = obj.get("density", 1.0)
-                    volume = obj.get("volume", 1.0)
-                    mass = density * volume * mc.influence
-                    mass_obj_data.append((obj, mass))
 
-        prev_local_rel_pos = {}
-        R_inv = accumulated_rotation.inverted().to_matrix()
-        for obj, mass in mass_obj_data:
-            r_world = obj.matrix_world.translation - com_start
-            prev_local_rel_pos[obj] = R_inv @ r_world
+class BP_RemoveBatchAction(bpy.types.Operator):
+    """Remove last Batch Action from Current Mass Object Group."""
+    bl_idname = "balance_point.batch_action_remove"
+    bl_label = "Remove Last Batch Action"
 
+    @classmethod
+    def poll(cls, context):
+        sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
+        return len(sel_mog.batch_actions) > 0
 
-        p0 = sel_mog.ballistics_starting_point
-        p1 = sel_mog.reference_point
+    def execute(self, context):
+        sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
+        sel_mog.batch_actions.remove(len(sel_mog.batch_actions) - 1)
+        return {'FINISHED'}
+
+
+class BakeBPBatchPhysics(BP_ModalFrameJob, bpy.types.Operator):
+    """Bakes physics for every group marked for batch baking, sampling all of them from one pass over the timeline."""
+    bl_idname = "balance_point.bake_physics_batch"
+    bl_label = "Batch Bake Physics"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        fps = float(sel_mog.frame_rate)
-        dt_frame = 1.0 / fps
-        substeps = sel_mog.substeps
-        dt_sub = dt_frame / substeps
-
-        for f in range(sel_mog.frame_start, sel_mog.frame_end + 1):
-            bpy.context.scene.frame_set(f)
-
-            if sel_mog.enable_ballistics_rotation:
-                # Internal Angular Momentum
-                L_int_local = Vector((0.0, 0.0, 0.0))
-                R_inv_curr = accumulated_rotation.inverted().to_matrix()
-
-                if f > sel_mog.frame_start:
-                    for obj, mass in mass_obj_data:
-                        r_world = obj.matrix_world.translation - get_com(sel_mog)
-                        r_local = R_inv_curr @ r_world
-                        
-                        v_local = (r_local - prev_local_rel_pos[obj]) / dt_frame
-                        
-                        L_int_local += mass * r_local.cross(v_local)
-                        
-                        prev_local_rel_pos[obj] = r_local
-
-                # Rotation
-                current_inertia_world = get_inertia_tensor(sel_mog, get_com(sel_mog))
-
-                R_start = accumulated_rotation.to_matrix()
-                I_body = R_start.transposed() @ current_inertia_world @ R_start
-
-                L_int_world = R_start @ L_int_local
-
-                # Rotation substeps
-                for _ in range(substeps):
-                    R_curr = accumulated_rotation.to_matrix()
-                    I_curr_world = R_curr @ I_body @ R_curr.transposed()
-
-                    # Subtract internal momentum from the total conserved momentum
-                    effective_momentum = momentum_vector - L_int_world
-                    current_ang_vel = I_curr_world.inverted_safe() @ effective_momentum
-
-                    rotation_angle = current_ang_vel.length * dt_sub
-                    
-                    if rotation_angle > 1e-6 and f > sel_mog.frame_start:
-                        rotation_axis = current_ang_vel.normalized()
-                        rot_step = Quaternion(rotation_axis, rotation_angle)
-                        accumulated_rotation = rot_step @ accumulated_rotation
-                        accumulated_rotation.normalize()
-
-                root_bone.rotation_quaternion = accumulated_rotation
-                root_bone.keyframe_insert(data_path="rotation_quaternion", keytype='GENERATED')
-                context.view_layer.update()
-
-            # Ballistics
-            start_pos = (p0[0], p0[1], p0[2])
-            ref_pos = (p1[0], p1[1], p1[2])
-            gravity = sel_mog.gravity
-            time_of_flight = float(sel_mog.time_of_flight)
-
-            elapsed_time = float(f - sel_mog.frame_start) / sel_mog.frame_rate
-
-            point_position = projectile_position_linear(
-                start_pos, ref_pos, gravity, time_of_flight, elapsed_time, sel_mog.damp_vector)
-
-            difference = get_com(sel_mog) - point_position
-            if difference.length > 0.00001:
-                world_space_diff = sel_mog.pinned_rig.matrix_world.inverted().to_3x3() @ Vector((difference.x, difference.y, difference.z))
-                sel_mog.pinned_rig.pose.bones[sel_mog.root_bone].location -= world_space_diff
-
-            root_bone.keyframe_insert(data_path="location", keytype='GENERATED')
+    @classmethod
+    def poll(cls, context):
+        return len(get_batch_groups(context.scene)) > 0
+
+    def job_start(self, context):
+        # For returning to original frame and actions after operation
+        super().job_start(context)
+
+        self.passes = plan_batch_passes(get_batch_groups(context.scene))
+        self.action_states = get_rig_action_states(self.passes)
+
+    def job_steps(self, context):
+        scene = context.scene
+        total = sum(len(bake_pass.frames) for bake_pass in self.passes)
+        done = 0
+
+        for bake_pass in self.passes:
+            bake_pass.assign_actions()
+
+            # Each frame is evaluated once for all groups in the pass
+            for frame in bake_pass.frames:
+                scene.frame_set(int(frame))
+                bake_pass.sample(frame)
+
+                done += 1
+                yield done, total
+
+    def job_finish(self, context):
+        group_count = 0
+
+        # Keys go into the action each group was sampled with
+        for bake_pass in self.passes:
+            bake_pass.assign_actions()
+
+            for group, samples in bake_pass.bakes:
+                write_physics_bake(group, solve_physics_bake(samples))
+                group_count += 1
 
         # Return to original state
-        bpy.context.scene.frame_set(original_frame)
+        restore_rig_action_states(self.action_states)
+        context.scene.frame_set(self.original_frame)
+
+        self.report({'INFO'}, "Baked {} group actions in {} passes.".format(group_count, len(self.passes)))
         return {'FINISHED'}
 
+    def job_cancel(self, context):
+        restore_rig_action_states(self.action_states)
+        return super().job_cancel(context)
+
 
-class BakeBPRootMotion(bpy.types.Operator):
+class BakeBPRootMotion(BP_ModalFrameJob, bpy.types.Operator):
     """Bakes Root Motion for the given frame range."""
     bl_idname = "balance_point.bake_root_motion"
     bl_label = "Bake Root Motion"
@@ -421,74 +439,52 @@ class BakeBPRootMotion(bpy.types.Operator):
         if len(sel_mog.root_control_bones) < 1:
             return False
 
+        if sel_mog.root_motion_frame_end < sel_mog.root_motion_frame_start:
+            return False
+
         return True
 
-    def execute(self, context):
+    def job_start(self, context):
+        # For returning to original frame after operation
+        super().job_start(context)
+
         selected_index = context.scene.bp_group_index
         sel_mog = context.scene.bp_mass_object_groups[selected_index]
-        pinned_rig = sel_mog.pinned_rig
-        root_bone = pinned_rig.pose.bones[sel_mog.root_bone]
-        root_limit = sel_mog.root_limit_xyz
-        root_fixed = sel_mog.root_bake_relative_xyz
-
-        animation_cache = []
-
-        for f in range(sel_mog.root_motion_frame_start, sel_mog.root_motion_frame_end + 1):
-            context.scene.frame_set(f)
-
-            new_root_location = Vector((root_limit[0], root_limit[1], root_limit[2]))
-            current_com = get_com(sel_mog)
-            if sel_mog.root_bake_relative:
-                new_root_location.x = current_com[0] + root_fixed[0]
-                new_root_location.y = current_com[1] + root_fixed[1]
-                new_root_location.z = current_com[2] + root_fixed[2]
-            else:
-                if sel_mog.root_track_xyz[0]:
-                    new_root_location.x = current_com[0]
-                if sel_mog.root_track_xyz[1]:
-                    new_root_location.y = current_com[1]
-                if sel_mog.root_track_xyz[2]:
-                    new_root_location.z = current_com[2]
-
-            control_bone_matrices = {cb.control_bone: pinned_rig.matrix_world @ pinned_rig.pose.bones[cb.control_bone].matrix.copy() for cb in sel_mog.root_control_bones}
-
-            animation_cache.append(
-                {
-                    "frame": f,
-                    "root_com": pinned_rig.matrix_world.inverted() @ new_root_location,
-                    "control_bone_matrices": control_bone_matrices
-                }
-            )
-
-        for data in animation_cache:
-            f = data["frame"]
-            context.scene.frame_set(f)
-
-            root_bone.matrix.translation = data["root_com"]
-            if sel_mog.root_bake_clear_rotation:
-                root_bone.rotation_quaternion = Quaternion((1.0, 0.0, 0.0, 0.0))
-
-            context.view_layer.update()
-
-            for control_bone_name, saved_matrix in data["control_bone_matrices"].items():
-                cb = pinned_rig.pose.bones.get(control_bone_name)
-
-                if cb:
-                    cb.matrix = pinned_rig.matrix_world.inverted() @ saved_matrix
-
-                    cb.keyframe_insert(data_path="location", index=-1, keytype='GENERATED')
-                    cb.keyframe_insert(data_path="scale", index=-1, keytype='GENERATED')
-
-                    if cb.rotation_mode == 'QUATERNION':
-                        cb.keyframe_insert(data_path="rotation_quaternion", index=-1, keytype='GENERATED')
-                    elif cb.rotation_mode == 'AXIS_ANGLE':
-                        cb.keyframe_insert(data_path="rotation_axis_angle", index=-1, keytype='GENERATED')
-                    else:
-                        cb.keyframe_insert(data_path="rotation_euler", index=-1, keytype='GENERATED')
-
-            if sel_mog.root_bake_clear_rotation:
-                root_bone.keyframe_insert(data_path="rotation_quaternion", index=-1, keytype='GENERATED')
-            root_bone.keyframe_insert(data_path="location", index=-1, keytype='GENERATED')
+        self.samples = RootMotionSamples(sel_mog)
+        self.transforms = get_transform_samples(
+            sel_mog, sel_mog.root_motion_frame_start, sel_mog.root_motion_frame_end, include_bones=True)
+
+    def job_steps(self, context):
+        # Sample COM and pose once per frame not already sampled for this animation
+        return iter_transform_samples(
+            context.scene, self.transforms, self.transforms.missing_frames(self.samples.frames[0], self.samples.frames[-1]))
+
+    def job_finish(self, context):
+        # Place the root and compensate control bones without re-evaluating frames
+        self.samples.load(self.transforms)
+        write_root_motion(self.samples, solve_root_motion(self.samples))
+
+        # Return to original frame
+        context.scene.frame_set(self.original_frame)
+
+        return {'FINISHED'}
+
+
+class FillBPComCache(BP_ModalFrameJob, bpy.types.Operator):
+    """Evaluate the frames missing from the COM timeline cache of every group that uses it."""
+    bl_idname = "balance_point.fill_com_cache"
+    bl_label = "Fill COM Cache"
+
+    @classmethod
+    def poll(cls, context):
+        return len(get_cached_groups(context.scene)) > 0
+
+    def job_steps(self, context):
+        return iter_fill_com_timelines(context.scene, get_cached_groups(context.scene))
+
+    def job_finish(self, context):
+        # Return to original frame
+        context.scene.frame_set(self.original_frame)
 
         return {'FINISHED'}
 
@@ -518,7 +514,7 @@ class BP_RootSetRelativeZ(bpy.types.Operator):
         selected_index = context.scene.bp_group_index
         sel_mog = context.scene.bp_mass_object_groups[selected_index]
         root_bone = sel_mog.pinned_rig.pose.bones[sel_mog.root_bone]
-        current_com_height = get_com(sel_mog).z
+        current_com_height = compute_mass_properties(sel_mog).com.z
 
         root_world_matrix = sel_mog.pinned_rig.matrix_world @ root_bone.matrix
 
@@ -587,7 +583,7 @@ class BP_DeleteControlBone(bpy.types.Operator):
         return {'FINISHED'}
 
 
-class CalculateBPMotionPath(bpy.types.Operator):
+class CalculateBPMotionPath(BP_ModalFrameJob, bpy.types.Operator):
     """Calculate the motion path of the mass object group's center of mass for the given range."""
     bl_idname = "balance_point.calculate_com_motion_path"
     bl_label = "Calculate Center of Mass Motion Path"
@@ -602,35 +598,72 @@ class CalculateBPMotionPath(bpy.types.Operator):
 
         return True
 
-    def execute(self, context):
+    def job_start(self, context):
+        # For returning to original frame after operation
+        super().job_start(context)
+
         selected_index = context.scene.bp_group_index
-        sel_mog = context.scene.bp_mass_object_groups[selected_index]
-        motion_path_points = sel_mog.motion_path_points
+        self.sel_mog = context.scene.bp_mass_object_groups[selected_index]
+        self.frames = np.arange(
+            self.sel_mog.motion_path_frame_start, self.sel_mog.motion_path_frame_end + 1, self.sel_mog.motion_path_frame_step)
+        self.transforms = get_transform_samples(self.sel_mog, self.frames[0], self.frames[-1])
 
-        # Clear points
-        motion_path_points.clear()
+    def job_steps(self, context):
+        # Sample the frames not already sampled for this animation
+        return iter_transform_samples(
+            context.scene, self.transforms, self.transforms.missing_frames(self.frames[0], self.frames[-1], self.sel_mog.motion_path_frame_step))
 
-        # For returning to original frame after operation
-        original_frame = bpy.context.scene.frame_current
+    def job_finish(self, context):
+        # Replace points
+        points = self.transforms.coms(self.frames, get_mass_index(self.sel_mog).masses)
+        set_motion_path(self.sel_mog, self.frames[0], points, self.sel_mog.motion_path_frame_step)
 
-        # Go to start of range
-        bpy.context.scene.frame_set(sel_mog.motion_path_frame_start)
+        # Return to original frame
+        context.scene.frame_set(self.original_frame)
 
-        for f in range(sel_mog.motion_path_frame_start, sel_mog.motion_path_frame_end + 1):
-            # Add motion path point
-            motion_path_points.add()
+        return {'FINISHED'}
+
+
+class UpdateBPMotionPath(BP_ModalFrameJob, bpy.types.Operator):
+    """Recalculate the motion path points affected by key edits since the path was calculated."""
+    bl_idname = "balance_point.update_com_motion_path"
+    bl_label = "Update Motion Path"
+
+    @classmethod
+    def poll(cls, context):
+        selected_index = context.scene.bp_group_index
+        mass_object_groups = context.scene.bp_mass_object_groups
+        if selected_index >= len(mass_object_groups):
+            return False
 
-            # Set Frame
-            bpy.context.scene.frame_set(f)
+        return len(get_pending_indices(mass_object_groups[selected_index])) > 0
 
-            # Get center of mass
-            group_com = get_com(sel_mog)
+    def job_start(self, context):
+        # For returning to original frame after operation
+        super().job_start(context)
+
+        selected_index = context.scene.bp_group_index
+        self.sel_mog = context.scene.bp_mass_object_groups[selected_index]
+        self.indices = get_pending_indices(self.sel_mog)
+        self.indices = self.indices[self.indices < len(get_motion_path_points(self.sel_mog))]
+        self.points = np.zeros((len(self.indices), 3))
 
-            # Set created point as center of mass
-            motion_path_points[-1].point_location = group_com
+    def job_steps(self, context):
+        frames = get_motion_path_frames(self.sel_mog)
+
+        for i, index in enumerate(self.indices):
+            context.scene.frame_set(int(frames[index]))
+            self.points[i] = compute_mass_properties(self.sel_mog).com
+            yield i + 1, len(self.indices)
+
+    def job_finish(self, context):
+        # Update the stored path in place
+        migrate_motion_path(self.sel_mog)
+        get_motion_path_points(self.sel_mog)[self.indices] = self.points
+        resolve_pending_indices(self.sel_mog, self.indices)
 
         # Return to original frame
-        bpy.context.scene.frame_set(original_frame)
+        context.scene.frame_set(self.original_frame)
 
         return {'FINISHED'}
 
@@ -644,12 +677,76 @@ class ClearBPMotionPath(bpy.types.Operator):
     def poll(cls, context):
         sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
 
-        return len(sel_mog.motion_path_points) > 0
+        return has_motion_path(sel_mog)
 
     def execute(self, context):
         sel_mog = context.scene.bp_mass_object_groups[context.scene.bp_group_index]
-        mois = sel_mog.motion_path_points
 
-        mois.clear()
+        clear_motion_path(sel_mog)
         bpy.context.region.tag_redraw()
         return {'FINISHED'}
+
+
+class ExportBPAnalysis(BP_ModalFrameJob, bpy.types.Operator):
+    """Export the mass object group's per-frame center of mass and mass properties over the motion path range to a JSON file."""
+    bl_idname = "balance_point.export_analysis"
+    bl_label = "Export Mass Analysis"
+
+    filepath: bpy.props.StringProperty(name="File Path", subtype='FILE_PATH')
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    @classmethod
+    def poll(cls, context):
+        selected_index = context.scene.bp_group_index
+        sel_mog = context.scene.bp_mass_object_groups[selected_index]
+
+        if sel_mog.motion_path_frame_end <= sel_mog.motion_path_frame_start:
+            return False
+
+        return True
+
+    def invoke(self, context, event):
+        if self.filepath == "":
+            # Ask for a file first. The file browser then calls execute, which
+            # samples the range at once instead of as a modal job.
+            self.filepath = bpy.path.ensure_ext(bpy.path.abspath("//balance_point_analysis"), ".json")
+            context.window_manager.fileselect_add(self)
+            return {'RUNNING_MODAL'}
+        return super().invoke(context, event)
+
+    def job_start(self, context):
+        # For returning to original frame after operation
+        super().job_start(context)
+
+        selected_index = context.scene.bp_group_index
+        self.sel_mog = context.scene.bp_mass_object_groups[selected_index]
+        self.frames = list(range(self.sel_mog.motion_path_frame_start, self.sel_mog.motion_path_frame_end + 1))
+        self.transforms = get_transform_samples(self.sel_mog, self.frames[0], self.frames[-1])
+
+    def job_steps(self, context):
+        # Sample the frames not already sampled for this animation
+        return iter_transform_samples(
+            context.scene, self.transforms, self.transforms.missing_frames(self.frames[0], self.frames[-1]))
+
+    def job_finish(self, context):
+        index = get_mass_index(self.sel_mog)
+        frame_props = [
+            MassSnapshot(index.masses, positions, index.radii).mass_properties()
+            for positions in self.transforms.positions[self.transforms.rows(self.frames)]]
+
+        analysis = {
+            "group": self.sel_mog.name,
+            "total_mass": float(index.masses.sum()),
+            "frames": self.frames,
+            "com": [tuple(mass_props.com) for mass_props in frame_props],
+            "inertia_tensor": [[list(row) for row in mass_props.inertia_tensor] for mass_props in frame_props],
+            "principal_moments": [tuple(mass_props.principal_moments) for mass_props in frame_props],
+        }
+
+        with open(bpy.path.abspath(self.filepath), "w") as analysis_file:
+            json.dump(analysis, analysis_file)
+
+        # Return to original frame
+        context.scene.frame_set(self.original_frame)
+
+        return {'FINISHED'}
@@ -1,19 +1,148 @@
 import bpy
 from bpy.app.handlers import persistent
 from mathutils import Vector
-from .utils import get_com
+from .utils import compute_mass_properties
+from .mass_index import get_mass_index, get_group_key
+from .com_cache import get_com_timeline, invalidate_com_timeline, is_sweeping
+
+
+# Smallest COM change written back to the scene
+COM_EPSILON = 1e-6
+
+# Settings each group's COM was last computed with
+_com_keys = {}
+
+# Set while the handlers write, so writes that update synchronously are ignored
+_updating = False
+
+# COM objects moved by the last handler call
+_moved_com_objects = set()
+
+
+def get_com_key(group):
+    com_object_name = group.com_object.name if group.com_object is not None else None
+    return (get_group_key(group), group.com_object_enabled, com_object_name)
+
+
+def is_group_affected(group, updated_objects, updated_actions, collections_updated):
+    if _com_keys.get((group.id_data.name, group.name)) != get_com_key(group):
+        return True
+
+    if collections_updated:
+        return True
+
+    rig = group.pinned_rig
+    if rig is not None and rig.as_pointer() in updated_objects:
+        return True
+
+    if rig is not None and rig.animation_data is not None and rig.animation_data.action is not None:
+        if rig.animation_data.action.as_pointer() in updated_actions:
+            return True
+
+    return not updated_objects.isdisjoint(get_mass_index(group).dependencies)
+
+
+def update_group_com(group, com_object_moves, frame=None):
+    timeline = get_com_timeline(group) if frame is not None else None
+    cached_com = timeline.get(frame) if timeline is not None else None
+
+    if cached_com is not None:
+        com_location = Vector(cached_com.tolist())
+    else:
+        com_location = compute_mass_properties(group).com
+        if timeline is not None:
+            timeline.set(frame, com_location)
+
+    # Only write values that changed, each write triggers another depsgraph update
+    if (Vector(group.com_location) - com_location).length > COM_EPSILON:
+        group.com_location = com_location
+    _com_keys[(group.id_data.name, group.name)] = get_com_key(group)
+
+    if group.com_object_enabled and group.com_object is not None:
+        com_object_moves[group.com_object.as_pointer()] = (group.com_object, com_location)
+
+
+def apply_com_object_moves(com_object_moves):
+    moved = set()
+
+    for pointer, (com_object, com_location) in com_object_moves.items():
+        if (com_object.matrix_world.translation - com_location).length > COM_EPSILON:
+            com_object.matrix_world.translation = com_location
+            moved.add(pointer)
+
+    return moved
+
+
+def update_group_coms(groups, frame=None):
+    global _updating, _moved_com_objects
+
+    _updating = True
+    try:
+        # Collect COM object moves from all groups, then move each object once
+        com_object_moves = {}
+        for group in groups:
+            update_group_com(group, com_object_moves, frame)
+
+        _moved_com_objects = apply_com_object_moves(com_object_moves)
+    finally:
+        _updating = False
 
 
 @persistent
-def update_mass_group_com(scene):
+def update_mass_group_com(scene, depsgraph=None):
+    global _moved_com_objects
+
+    if _updating:
+        return
+
     bp_mass_groups = bpy.context.scene.bp_mass_object_groups
 
+    updated_objects = set()
+    updated_actions = set()
+    collections_updated = False
+
+    if depsgraph is not None:
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                updated_objects.add(update.id.original.as_pointer())
+            elif isinstance(update.id, bpy.types.Action):
+                updated_actions.add(update.id.original.as_pointer())
+            elif isinstance(update.id, bpy.types.Collection):
+                collections_updated = True
+
+        # The update caused by our own COM object moves
+        echo = not collections_updated and not updated_actions and updated_objects and updated_objects <= _moved_com_objects
+        _moved_com_objects = set()
+        if echo:
+            return
+
+    groups = []
     for group in bp_mass_groups:
         if any(mass_collection is not None for mass_collection in group.mass_collections):
-            com_location = get_com(group)
+            # Skip groups that nothing in this update can move
+            if depsgraph is not None and not is_group_affected(group, updated_objects, updated_actions, collections_updated):
+                continue
+
+            # Edits can change the COM on any frame. Transform samples are
+            # kept, their fingerprint is checked when an operator uses them.
+            invalidate_com_timeline(group)
+            groups.append(group)
 
-            group.com_location = com_location
-            
-            if group.com_object_enabled:
-                group.com_object.matrix_world.translation = com_location
+    update_group_coms(groups)
 
+
+@persistent
+def update_mass_group_com_frame(scene, depsgraph=None):
+    if _updating or is_sweeping():
+        return
+
+    # Animation can move any group on a frame change
+    update_group_coms([
+        group for group in bpy.context.scene.bp_mass_object_groups
+        if any(mass_collection is not None for mass_collection in group.mass_collections)],
+        bpy.context.scene.frame_current)
+
+
+@persistent
+def clear_com_keys(*args):
+    _com_keys.clear()
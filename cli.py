@@ -0,0 +1,215 @@
+"""Headless batch processing for Balance Point.
+
+Run the coordinator from Blender or from a plain Python interpreter:
+
+    blender -b --python cli.py -- manifest.json --report report.json
+    python cli.py manifest.json --blender /path/to/blender --jobs 8
+
+The coordinator starts one background Blender process per file in the
+manifest, at most --jobs at a time (one per core by default), and collects
+each file's per-group results and timings into one JSON report.
+
+Manifest:
+
+    {
+        "addon": "balance_point",
+        "files": [
+            {
+                "path": "shots/jump.blend",
+                "groups": ["Hero"],
+                "operations": ["motion_path", "physics_bake", "root_motion_bake", "analysis_export"],
+                "export_dir": "analysis",
+                "save": true
+            }
+        ]
+    }
+
+Relative paths are resolved against the manifest's directory. "groups"
+defaults to every Mass Object Group in the file.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+OPERATIONS = {
+    "motion_path": "calculate_com_motion_path",
+    "physics_bake": "bake_physics",
+    "root_motion_bake": "bake_root_motion",
+    "analysis_export": "export_analysis",
+}
+
+DEFAULT_ADDON = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Worker (runs inside a background Blender process)
+
+
+def run_worker(task_path, result_path):
+    import bpy
+    import addon_utils
+
+    with open(task_path) as task_file:
+        task = json.load(task_file)
+
+    _, addon_loaded = addon_utils.check(task["addon"])
+    if not addon_loaded:
+        addon_utils.enable(task["addon"], default_set=False)
+
+    scene = bpy.context.scene
+    groups = scene.bp_mass_object_groups
+    group_names = task.get("groups") or [group.name for group in groups]
+    blend_name = os.path.splitext(os.path.basename(bpy.data.filepath))[0]
+    results = []
+
+    for group_name in group_names:
+        group_index = groups.find(group_name)
+
+        for operation in task["operations"]:
+            result = {"group": group_name, "operation": operation}
+            started = time.perf_counter()
+
+            try:
+                if group_index < 0:
+                    raise KeyError("Mass Object Group not found: {}".format(group_name))
+                if operation not in OPERATIONS:
+                    raise KeyError("Unknown operation: {}".format(operation))
+
+                scene.bp_group_index = group_index
+                operator = getattr(bpy.ops.balance_point, OPERATIONS[operation])
+                kwargs = {}
+                if operation == "analysis_export":
+                    export_dir = task.get("export_dir") or os.path.dirname(bpy.data.filepath)
+                    os.makedirs(export_dir, exist_ok=True)
+                    kwargs["filepath"] = os.path.join(export_dir, "{}_{}.json".format(blend_name, bpy.path.clean_name(group_name)))
+                    result["output"] = kwargs["filepath"]
+
+                result["status"] = sorted(operator('EXEC_DEFAULT', **kwargs))[0]
+            except Exception as error:
+                result["status"] = 'FAILED'
+                result["error"] = str(error)
+
+            result["seconds"] = time.perf_counter() - started
+            results.append(result)
+
+    if task.get("save") and all(result["status"] == 'FINISHED' for result in results):
+        bpy.ops.wm.save_mainfile()
+
+    with open(result_path, "w") as result_file:
+        json.dump(results, result_file)
+
+
+# Coordinator
+
+
+def run_file(blender, task, work_dir, index, timeout):
+    task_path = os.path.join(work_dir, "task_{}.json".format(index))
+    result_path = os.path.join(work_dir, "result_{}.json".format(index))
+
+    with open(task_path, "w") as task_file:
+        json.dump(task, task_file)
+
+    command = [blender, "-b", task["path"], "--python-exit-code", "1", "--python", os.path.abspath(__file__), "--", "--worker", task_path, result_path]
+    report = {"path": task["path"]}
+    started = time.perf_counter()
+
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        report["returncode"] = process.returncode
+        log = process.stderr or process.stdout
+    except subprocess.TimeoutExpired:
+        report["returncode"] = None
+        log = "Timed out after {} seconds.".format(timeout)
+
+    report["seconds"] = time.perf_counter() - started
+
+    if os.path.exists(result_path):
+        with open(result_path) as result_file:
+            report["results"] = json.load(result_file)
+        report["status"] = 'FINISHED' if all(result["status"] == 'FINISHED' for result in report["results"]) else 'FAILED'
+    else:
+        report["results"] = []
+        report["status"] = 'FAILED'
+        report["log"] = log[-2000:]
+
+    return report
+
+
+def run_coordinator(manifest_path, report_path, jobs, blender, timeout):
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    addon = manifest.get("addon", DEFAULT_ADDON)
+    tasks = []
+
+    for entry in manifest["files"]:
+        task = dict(entry)
+        task["addon"] = addon
+        task["path"] = os.path.join(base_dir, entry["path"])
+        task.setdefault("operations", list(OPERATIONS))
+        if task.get("export_dir"):
+            task["export_dir"] = os.path.join(base_dir, task["export_dir"])
+        tasks.append(task)
+
+    jobs = jobs or manifest.get("jobs") or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_file, blender, task, work_dir, index, timeout) for index, task in enumerate(tasks)]
+        file_reports = [future.result() for future in futures]
+
+    report = {
+        "manifest": os.path.abspath(manifest_path),
+        "jobs": jobs,
+        "seconds": time.perf_counter() - started,
+        "failed": sum(file_report["status"] != 'FINISHED' for file_report in file_reports),
+        "files": file_reports,
+    }
+
+    if report_path:
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    return report
+
+
+def get_blender_binary():
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        return os.environ.get("BLENDER", "blender")
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "--worker":
+        run_worker(argv[1], argv[2])
+        return 0
+
+    parser = argparse.ArgumentParser(description="Run Balance Point operations on many .blend files in background Blender processes.")
+    parser.add_argument("manifest", help="JSON manifest of files, groups and operations")
+    parser.add_argument("--report", help="Write the JSON report here instead of printing it")
+    parser.add_argument("--jobs", type=int, default=0, help="Blender processes to run at once (default: one per core)")
+    parser.add_argument("--blender", default=get_blender_binary(), help="Blender binary used for the workers")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds before a file's worker is stopped")
+    args = parser.parse_args(argv)
+
+    report = run_coordinator(args.manifest, args.report, args.jobs, args.blender, args.timeout)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    # Blender passes script arguments after "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    exit_code = main(argv)
+
+    if exit_code:
+        sys.exit(exit_code)
@@ -0,0 +1,117 @@
+import numpy as np
+from bpy.app.handlers import persistent
+from .mass_index import get_group_key
+from .utils import compute_mass_properties
+
+
+_timelines = {}
+_sweeping = False
+
+
+class ComTimeline:
+    """COM of a Mass Object Group for every frame of the scene range, filled as frames are played or by Fill COM Cache."""
+
+    def __init__(self, key, frame_start, frame_end):
+        self.key = key
+        self.frame_start = frame_start
+        self.coms = np.zeros((max(frame_end - frame_start + 1, 0), 3))
+        self.filled = np.zeros(len(self.coms), dtype=bool)
+
+    def __len__(self):
+        return len(self.coms)
+
+    @property
+    def filled_count(self):
+        return int(self.filled.sum())
+
+    @property
+    def is_complete(self):
+        return bool(self.filled.all())
+
+    def get(self, frame):
+        i = frame - self.frame_start
+        if 0 <= i < len(self.coms) and self.filled[i]:
+            return self.coms[i]
+        return None
+
+    def set(self, frame, com):
+        i = frame - self.frame_start
+        if 0 <= i < len(self.coms):
+            self.coms[i] = com
+            self.filled[i] = True
+
+    def missing_frames(self):
+        return np.flatnonzero(~self.filled) + self.frame_start
+
+
+def get_timeline_key(group):
+    scene = group.id_data
+    return (get_group_key(group), scene.frame_start, scene.frame_end)
+
+
+def find_com_timeline(group):
+    """The group's current timeline, or None. Never creates one, so it is safe to call while drawing."""
+    if not group.use_com_cache:
+        return None
+
+    timeline = _timelines.get((group.id_data.name, group.name))
+    if timeline is None or timeline.key != get_timeline_key(group):
+        return None
+    return timeline
+
+
+def get_com_timeline(group):
+    if not group.use_com_cache:
+        return None
+
+    timeline = find_com_timeline(group)
+    if timeline is None:
+        timeline = ComTimeline(get_timeline_key(group), group.id_data.frame_start, group.id_data.frame_end)
+        _timelines[(group.id_data.name, group.name)] = timeline
+
+    return timeline
+
+
+def invalidate_com_timeline(group):
+    _timelines.pop((group.id_data.name, group.name), None)
+
+
+def is_sweeping():
+    return _sweeping
+
+
+def get_cached_groups(scene):
+    return [
+        group for group in scene.bp_mass_object_groups
+        if group.use_com_cache and any(mass_collection is not None for mass_collection in group.mass_collections)]
+
+
+def iter_fill_com_timelines(scene, groups):
+    """Evaluate the frames missing from the groups' timelines, yielding (frames done, total frames).
+
+    Only run from an operator: changing frames re-evaluates animated
+    channels, which discards unkeyed edits.
+    """
+    global _sweeping
+
+    timelines = [(group, get_com_timeline(group)) for group in groups]
+    missing = np.unique(np.concatenate([timeline.missing_frames() for _, timeline in timelines])) if timelines else []
+
+    for index, frame in enumerate(missing):
+        # The frame change handler skips its own update during the sweep
+        _sweeping = True
+        try:
+            scene.frame_set(int(frame))
+        finally:
+            _sweeping = False
+
+        for group, timeline in timelines:
+            if timeline.get(frame) is None:
+                timeline.set(frame, compute_mass_properties(group).com)
+
+        yield index + 1, len(missing)
+
+
+@persistent
+def clear_com_timelines(*args):
+    _timelines.clear()
@@ -0,0 +1,133 @@
+import bpy
+import hashlib
+import json
+import os
+import numpy as np
+
+
+# Sidecar entries are "<scene>_<group>_<hash>.<fingerprint>.<array>.npy" files
+# with a "<scene>_<group>_<hash>.<fingerprint>.json" metadata file, written last.
+
+# Entries written with another version are never loaded
+CACHE_VERSION = 2
+
+
+def get_cache_dir():
+    if not bpy.data.filepath:
+        return None
+
+    blend_dir, blend_name = os.path.split(bpy.data.filepath)
+    return os.path.join(blend_dir, os.path.splitext(blend_name)[0] + "_bp_cache")
+
+
+def get_entry_prefix(scene_name, group_name):
+    # clean_name leaves no dots, so file names split cleanly. It maps names
+    # like "Hero.001" and "Hero_001" alike, so the raw names are hashed too.
+    names_hash = hashlib.sha1(repr((scene_name, group_name)).encode()).hexdigest()[:8]
+    return "{}_{}".format(bpy.path.clean_name("{}_{}".format(scene_name, group_name)), names_hash)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def evict_stale_entries(cache_dir, prefix, fingerprint):
+    """Delete the group's entries for any other fingerprint, and temporary files left by failed writes."""
+    for file_name in os.listdir(cache_dir):
+        parts = file_name.split(".")
+        if len(parts) >= 3 and parts[0] == prefix and (parts[1] != fingerprint or parts[-1] == "tmp"):
+            remove_file(os.path.join(cache_dir, file_name))
+
+
+def save_arrays(scene_name, group_name, fingerprint, metadata, arrays):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return False
+
+    prefix = get_entry_prefix(scene_name, group_name)
+    entry = os.path.join(cache_dir, "{}.{}".format(prefix, fingerprint))
+
+    temp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        evict_stale_entries(cache_dir, prefix, fingerprint)
+
+        # The old metadata goes first, so the entry is never read half replaced
+        remove_file(entry + ".json")
+
+        for name, array in arrays.items():
+            # Replace whole files, so readers never map a partial array
+            temp_path = "{}.{}.tmp".format(entry, name)
+            with open(temp_path, "wb") as array_file:
+                np.save(array_file, np.ascontiguousarray(array))
+            os.replace(temp_path, "{}.{}.npy".format(entry, name))
+
+        temp_path = entry + ".json.tmp"
+        metadata = dict(metadata, version=CACHE_VERSION, arrays=sorted(arrays))
+        with open(temp_path, "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(temp_path, entry + ".json")
+    except OSError:
+        # The sidecar cache is best effort, e.g. a read-only library folder
+        if temp_path is not None:
+            remove_file(temp_path)
+        return False
+
+    return True
+
+
+def update_rows(scene_name, group_name, fingerprint, rows, arrays):
+    """Write the given rows of the arrays into the group's entry in place.
+
+    Returns False if the entry is missing or its arrays have other shapes.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return False
+
+    entry = os.path.join(cache_dir, "{}.{}".format(get_entry_prefix(scene_name, group_name), fingerprint))
+    if not os.path.exists(entry + ".json"):
+        return False
+
+    try:
+        # Rows go in before their filled flags
+        for name in sorted(arrays, key=lambda name: name == "filled"):
+            target = np.load("{}.{}.npy".format(entry, name), mmap_mode='r+')
+            if target.shape != arrays[name].shape or target.dtype != arrays[name].dtype:
+                return False
+
+            target[rows] = arrays[name][rows]
+            target.flush()
+            del target
+    except (OSError, ValueError):
+        return False
+
+    return True
+
+
+def load_arrays(scene_name, group_name, fingerprint):
+    """Metadata and memory-mapped arrays of the group's entry for the fingerprint, or None."""
+    cache_dir = get_cache_dir()
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return None
+
+    prefix = get_entry_prefix(scene_name, group_name)
+    entry = os.path.join(cache_dir, "{}.{}".format(prefix, fingerprint))
+    evict_stale_entries(cache_dir, prefix, fingerprint)
+
+    try:
+        with open(entry + ".json") as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata.get("version") != CACHE_VERSION:
+            return None
+
+        # Mapped lazily, pages are read when rows are used. Copy-on-write,
+        # so sampling more frames only copies the pages it changes.
+        arrays = {name: np.load("{}.{}.npy".format(entry, name), mmap_mode='c') for name in metadata["arrays"]}
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return metadata, arrays
@@ -3,22 +3,74 @@ import gpu
 import numpy
 import math
 from gpu_extras.batch import batch_for_shader
-from mathutils import Vector, Matrix
+from mathutils import Vector
 from .utils import (
-    projectile_position_linear,
-    get_com,
+    compute_mass_properties,
+    BallisticTrajectory,
+)
+from .mass_index import get_mass_index
+from .motion_path import (
+    has_motion_path,
+    get_motion_path_points,
+    get_motion_path_range,
 )
 from .shapes import SHAPE_FLOOR_MARKER
 
-shader = gpu.shader.from_builtin('POINT_UNIFORM_COLOR')
+# Shaders are created on first draw, so the add-on can load in background mode
+shader = None
+path_shader = None
+
+
+def get_path_shader():
+    global path_shader
+
+    # Colors a path by comparing each vertex frame against the current frame,
+    # so scrubbing only changes a uniform.
+    if path_shader is None:
+        vert_out = gpu.types.GPUStageInterfaceInfo("bp_path_interface")
+        vert_out.smooth('FLOAT', "frameInterp")
+
+        shader_info = gpu.types.GPUShaderCreateInfo()
+        shader_info.push_constant('MAT4', "viewProjectionMatrix")
+        shader_info.push_constant('FLOAT', "currentFrame")
+        shader_info.push_constant('VEC4', "pastColor")
+        shader_info.push_constant('VEC4', "futureColor")
+        shader_info.vertex_in(0, 'VEC3', "pos")
+        shader_info.vertex_in(1, 'FLOAT', "frame")
+        shader_info.vertex_out(vert_out)
+        shader_info.fragment_out(0, 'VEC4', "fragColor")
+        shader_info.vertex_source(
+            "void main()"
+            "{"
+            "  frameInterp = frame;"
+            "  gl_Position = viewProjectionMatrix * vec4(pos, 1.0);"
+            "}"
+        )
+        shader_info.fragment_source(
+            "void main()"
+            "{"
+            "  fragColor = frameInterp <= currentFrame ? pastColor : futureColor;"
+            "}"
+        )
+        path_shader = gpu.shader.create_from_info(shader_info)
+        del vert_out
+        del shader_info
+
+    return path_shader
 
 
 def draw_bp(self, context):
     com_props = bpy.context.scene.bp_com_properties
     bp_mass_groups = bpy.context.scene.bp_mass_object_groups
 
+    global shader
+    if shader is None:
+        shader = gpu.shader.from_builtin('POINT_UNIFORM_COLOR')
+
     gpu.state.blend_set('ALPHA')
 
+    prune_batch_cache()
+
     if not com_props.com_drawing_on or len(bp_mass_groups) == 0:
         return
 
@@ -29,7 +81,11 @@ def draw_bp(self, context):
         has_mass_objects = any(mc is not None for mc in group.mass_collections)
 
         if has_mass_objects:
-            group_com = get_com(group)
+            if group.use_com_cache:
+                # Kept current by the frame change handler from the COM timeline
+                group_com = Vector(group.com_location)
+            else:
+                group_com = compute_mass_properties(group).com
 
             if com_props.draw_volume:
                 draw_volume_shapes(group, com_props)
@@ -44,47 +100,77 @@ def draw_bp(self, context):
     gpu.state.point_size_set(1.0)
 
 
-def draw_motion_path(group, com_props):
-    if len(
-            group.motion_path_points) > 0 and any(mass_collection is not None for mass_collection in group.mass_collections):
-        point_positions = []
+# Batch Cache
+
+_batch_cache = {}
+
+
+def get_cached_batch(group, overlay, fingerprint, build):
+    # Per viewport, since some fingerprints depend on the view
+    key = (bpy.context.region.as_pointer(), group.id_data.name, group.name, overlay)
+    cached = _batch_cache.get(key)
+
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, build())
+        _batch_cache[key] = cached
+
+    return cached[1]
+
+
+def prune_batch_cache():
+    """Drop the batches of closed viewports and of renamed or removed groups."""
+    regions = {
+        region.as_pointer() for window in bpy.context.window_manager.windows
+        for area in window.screen.areas if area.type == 'VIEW_3D'
+        for region in area.regions}
+    groups = {(scene.name, group.name) for scene in bpy.data.scenes for group in scene.bp_mass_object_groups}
+
+    for key in [key for key in _batch_cache if key[0] not in regions or key[1:3] not in groups]:
+        del _batch_cache[key]
+
+
+def array_fingerprint(array):
+    return (array.shape, hash(array.tobytes()))
+
+
+def build_path_batches(point_array, first_frame, frame_step=1):
+    point_array = numpy.ascontiguousarray(point_array, dtype=numpy.float32)
+    frames = (first_frame + frame_step * numpy.arange(len(point_array))).astype(numpy.float32)
+
+    line_batch = batch_for_shader(get_path_shader(), 'LINE_STRIP', {"pos": point_array, "frame": frames})
+    point_batch = batch_for_shader(shader, 'POINTS', {"pos": point_array})
+    return line_batch, point_batch
+
+
+def draw_path_batches(path_batches, point_size, com_props):
+    line_batch, point_batch = path_batches
 
+    # Draw lines
+    line_shader = get_path_shader()
+    line_shader.bind()
+    line_shader.uniform_float("viewProjectionMatrix", bpy.context.region_data.perspective_matrix)
+    line_shader.uniform_float("currentFrame", float(bpy.context.scene.frame_current))
+    line_shader.uniform_float("pastColor", (1.0, 0.0, 0.0, com_props.opacity))
+    line_shader.uniform_float("futureColor", (0.0, 1.0, 0.0, com_props.opacity))
+    line_batch.draw(line_shader)
+
+    # Draw points
+    shader.bind()
+    shader.uniform_float("color", (0.0, 0.0, 0.0, com_props.opacity))
+    gpu.state.point_size_set(point_size)
+    point_batch.draw(shader)
+
+
+def draw_motion_path(group, com_props):
+    if has_motion_path(group) and any(mass_collection is not None for mass_collection in group.mass_collections):
         # Get Points
-        for path_point in group.motion_path_points:
-            point_loc = path_point.point_location
-            point_positions.append(
-                Vector((point_loc[0], point_loc[1], point_loc[2])))
-
-        # Draw lines
-        for index, point_position in enumerate(
-                point_positions):
-            line_batch = []
-            line_color = (1.0, 0.0, 0.0, com_props.opacity) if index + \
-                group.motion_path_frame_start <= bpy.context.scene.frame_current else (0.0, 1.0, 0.0, com_props.opacity)
-            shader.uniform_float("color", line_color)
-            point_coordinate = (
-                point_position[0], point_position[1], point_position[2])
-
-            if index > 0:
-                previous_coordinate = point_positions[index - 1]
-                line_batch += [(previous_coordinate[0],
-                                previous_coordinate[1], previous_coordinate[2])]
-                line_batch += [(point_coordinate[0],
-                                point_coordinate[1], point_coordinate[2])]
-
-            batch = batch_for_shader(
-                shader, 'LINES', {"pos": line_batch})
-            batch.draw(shader)
-
-        # Draw Points
-        for index, point_position in enumerate(
-                point_positions):
-            shader.uniform_float("color", (0.0, 0.0, 0.0, com_props.opacity))
-            gpu.state.point_size_set(
-                com_props.motion_path_point_size)
-            batch = batch_for_shader(
-                shader, 'POINTS', {"pos": point_positions})
-            batch.draw(shader)
+        point_array = get_motion_path_points(group)
+        frame_start, frame_step = get_motion_path_range(group)
+        fingerprint = (frame_start, frame_step, array_fingerprint(point_array))
+
+        path_batches = get_cached_batch(
+            group, 'MOTION_PATH', fingerprint, lambda: build_path_batches(point_array, frame_start, frame_step))
+        draw_path_batches(path_batches, com_props.motion_path_point_size, com_props)
 
 
 def draw_reference_points(group, com_props):
@@ -94,34 +180,33 @@ def draw_reference_points(group, com_props):
             com_props.reference_point_size)
         shader.uniform_float(
             "color", (group.reference_color[0], group.reference_color[1], group.reference_color[2], group.reference_color[3] * com_props.opacity))
-        batch = batch_for_shader(
-            shader, 'POINTS', {"pos": [Vector(group.reference_point)]})
+        reference_point = tuple(group.reference_point)
+        batch = get_cached_batch(
+            group, 'REFERENCE_POINT', reference_point, lambda: batch_for_shader(shader, 'POINTS', {"pos": [reference_point]}))
         batch.draw(shader)
 
         # Ballistics Starting Point
         shader.uniform_float(
             "color", (group.ballistics_starting_point_color[0], group.ballistics_starting_point_color[1], group.ballistics_starting_point_color[2], group.ballistics_starting_point_color[3] * com_props.opacity))
-        batch = batch_for_shader(
-            shader, 'POINTS', {"pos": [Vector(group.ballistics_starting_point)]})
+        starting_point = tuple(group.ballistics_starting_point)
+        batch = get_cached_batch(
+            group, 'STARTING_POINT', starting_point, lambda: batch_for_shader(shader, 'POINTS', {"pos": [starting_point]}))
         batch.draw(shader)
 
 
 def draw_rotation_axis(group, group_com, com_props):
     if group.show_axis and com_props.rotation_axis_line_size > 0:
-        axis_verts = []
-
-        cx = group.initial_axis.x
-        cy = group.initial_axis.y
-        cz = group.initial_axis.z
-        axis_vector = numpy.array([cx, cy, cz])
-        axis_unit = axis_vector / \
-            numpy.linalg.norm(axis_vector)
-        axis_verts += transform_indices([(-axis_unit[0], -axis_unit[1], -axis_unit[2]), (
-            axis_unit[0], axis_unit[1], axis_unit[2])], com_props.rotation_axis_line_size / 2, group_com)
-        batch = batch_for_shader(
-            shader, 'LINES', {"pos": axis_verts})
-        batch = batch_for_shader(
-            shader, 'LINES', {"pos": axis_verts})
+        def build():
+            axis_vector = numpy.array(group.initial_axis)
+            axis_unit = axis_vector / \
+                numpy.linalg.norm(axis_vector)
+            axis_verts = transform_indices([(-axis_unit[0], -axis_unit[1], -axis_unit[2]), (
+                axis_unit[0], axis_unit[1], axis_unit[2])], com_props.rotation_axis_line_size / 2, group_com)
+            return batch_for_shader(
+                shader, 'LINES', {"pos": axis_verts})
+
+        fingerprint = (tuple(group_com), tuple(group.initial_axis), com_props.rotation_axis_line_size)
+        batch = get_cached_batch(group, 'ROTATION_AXIS', fingerprint, build)
         batch.draw(shader)
 
 
@@ -132,75 +217,50 @@ def draw_com_markers(group, group_com, com_props):
 
     # Draw COM Shape
     gpu.state.point_size_set(com_props.com_point_size)
-    batch = batch_for_shader(
-        shader, 'POINTS', {"pos": [group_com]})
+    batch = get_cached_batch(
+        group, 'COM_POINT', tuple(group_com), lambda: batch_for_shader(shader, 'POINTS', {"pos": [group_com]}))
     batch.draw(shader)
 
     # Draw Floor COM
     if com_props.floor_com_size > 0.0:
         floor_com_location = Vector(
             (group_com[0], group_com[1], group.com_floor_level))
-        floor_com_verts = transform_indices(
-            SHAPE_FLOOR_MARKER, 0.05 * com_props.floor_com_size, floor_com_location)
-        batch = batch_for_shader(
-            shader, 'LINES', {"pos": floor_com_verts})
+
+        def build():
+            floor_com_verts = transform_indices(
+                SHAPE_FLOOR_MARKER, 0.05 * com_props.floor_com_size, floor_com_location)
+            return batch_for_shader(
+                shader, 'LINES', {"pos": floor_com_verts})
+
+        fingerprint = (tuple(floor_com_location), com_props.floor_com_size)
+        batch = get_cached_batch(group, 'FLOOR_MARKER', fingerprint, build)
         batch.draw(shader)
 
 
 def draw_ballistics_ruler(group, com_props):
     if group.is_ballistics_preview:
         if group.frame_end > group.frame_start and group.time_of_flight > 0:
-            point_positions = []
-
-            total_frames = group.frame_end - group.frame_start
-
-            # Get points
-            p0 = Vector(group.ballistics_starting_point)
-            p1 = Vector(group.reference_point)
-
-            for frame in range(total_frames + 1):
-                start_pos = (p0[0], p0[1], p0[2])
-                ref_pos = (p1[0], p1[1], p1[2])
-                gravity = group.gravity
-                time_of_flight = float(
-                    group.time_of_flight)
-                elapsed_time = float(
-                    frame) / group.frame_rate
-
-                point_positions.append(projectile_position_linear(
-                    start_pos, ref_pos, gravity, time_of_flight, elapsed_time, group.damp_vector))
-
-            # Draw lines
-            for index, point_position in enumerate(
-                    point_positions):
-                line_batch = []
-                line_color = (1.0, 0.0, 0.0, com_props.opacity) if index + \
-                    group.frame_start <= bpy.context.scene.frame_current else (0.0, 1.0, 0.0, com_props.opacity)
-                shader.uniform_float("color", line_color)
-                point_coordinate = (
-                    point_position[0], point_position[1], point_position[2])
-
-                if index > 0:
-                    previous_coordinate = point_positions[index - 1]
-                    line_batch += [(previous_coordinate[0],
-                                    previous_coordinate[1], previous_coordinate[2])]
-                    line_batch += [(point_coordinate[0],
-                                    point_coordinate[1], point_coordinate[2])]
-
-                batch = batch_for_shader(
-                    shader, 'LINES', {"pos": line_batch})
-                batch.draw(shader)
-
-            # Draw points
-            for index, point_position in enumerate(
-                    point_positions):
-                shader.uniform_float(
-                    "color", (0.0, 0.0, 0.0, com_props.opacity))
-                gpu.state.point_size_set(
-                    com_props.ballistics_point_size)
-                batch = batch_for_shader(
-                    shader, 'POINTS', {"pos": point_positions})
-                batch.draw(shader)
+            def build():
+                total_frames = group.frame_end - group.frame_start
+
+                # Get points
+                trajectory = BallisticTrajectory(
+                    group.ballistics_starting_point, group.reference_point, group.gravity, group.time_of_flight, group.damp_vector)
+                elapsed_times = numpy.arange(total_frames + 1) / group.frame_rate
+                return build_path_batches(trajectory.positions(elapsed_times), group.frame_start)
+
+            fingerprint = (
+                tuple(group.ballistics_starting_point),
+                tuple(group.reference_point),
+                group.gravity,
+                group.time_of_flight,
+                tuple(group.damp_vector),
+                group.frame_start,
+                group.frame_end,
+                group.frame_rate,
+            )
+            path_batches = get_cached_batch(group, 'BALLISTICS', fingerprint, build)
+            draw_path_batches(path_batches, com_props.ballistics_point_size, com_props)
 
 
 def rotate_points(points, angle_deg, axis):
@@ -242,38 +302,36 @@ def transform_indices(vertices, scale, translate_vector,
 
 
 def draw_volume_shapes(group, com_props):
-    import math
-
     view_matrix = bpy.context.region_data.view_matrix.inverted()
     view_rotation = view_matrix.to_quaternion()
 
-    shader.bind()
+    index = get_mass_index(group)
+    visible = index.radii > 0
+    if not visible.any():
+        return
 
-    segments = 12
-    circle_template = [
-        Vector((math.cos(math.tau * i / segments), math.sin(math.tau * i / segments), 0))
-        for i in range(segments + 1)
-    ]
+    centers = index.positions()[visible]
+    radii = index.radii[visible]
 
-    for mass_collection in group.mass_collections:
-        if not mass_collection.mass_object_collection:
-            continue
-            
-        for obj in mass_collection.mass_object_collection.all_objects:
-            if not obj.get("active"):
-                continue
-
-            vol = obj.get("volume", 0)
-            if vol <= 0: continue
-            radius = ((3 * vol) / (4 * math.pi))**(1/3) / 10
-            
-            center = obj.matrix_world.translation
-            
-            billboard_matrix = Matrix.Translation(center) @ view_rotation.to_matrix().to_4x4() @ Matrix.Scale(radius, 4)
-            
-            billboard_verts = [billboard_matrix @ v for v in circle_template]
-
-            shader.uniform_float("color", (com_props.volume_color[0], com_props.volume_color[1], com_props.volume_color[2], com_props.opacity * com_props.volume_color[3]))
-            
-            batch = batch_for_shader(shader, 'TRI_FAN', {"pos": billboard_verts})
-            batch.draw(shader)
\ No newline at end of file
+    def build():
+        segments = 12
+        angles = numpy.linspace(0.0, math.tau, segments + 1)
+        circle_template = numpy.stack((numpy.cos(angles), numpy.sin(angles), numpy.zeros(segments + 1)), axis=1)
+
+        # Billboard every circle towards the view, then fan each one into triangles
+        circle_template = circle_template @ numpy.array(view_rotation.to_matrix()).T
+        rims = centers[:, None, :] + radii[:, None, None] * circle_template[None, :, :]
+
+        triangles = numpy.empty((len(centers), segments, 3, 3), dtype=numpy.float32)
+        triangles[:, :, 0] = centers[:, None, :]
+        triangles[:, :, 1] = rims[:, :-1]
+        triangles[:, :, 2] = rims[:, 1:]
+
+        return batch_for_shader(shader, 'TRIS', {"pos": triangles.reshape(-1, 3)})
+
+    fingerprint = (tuple(view_rotation), array_fingerprint(centers), array_fingerprint(radii))
+    batch = get_cached_batch(group, 'VOLUME', fingerprint, build)
+
+    shader.bind()
+    shader.uniform_float("color", (com_props.volume_color[0], com_props.volume_color[1], com_props.volume_color[2], com_props.opacity * com_props.volume_color[3]))
+    batch.draw(shader)
@@ -0,0 +1,134 @@
+import time
+
+
+class JobProgress:
+    """Progress of the running frame job, shown in the sidebar and status bar."""
+
+    def __init__(self, label):
+        self.label = label
+        self.done = 0
+        self.total = 0
+        self.started = time.perf_counter()
+
+    @property
+    def factor(self):
+        return self.done / self.total if self.total > 0 else 0.0
+
+    @property
+    def eta(self):
+        if self.done == 0:
+            return None
+        elapsed = time.perf_counter() - self.started
+        return elapsed / self.done * (self.total - self.done)
+
+    def format(self):
+        text = "{}: {}/{} frames".format(self.label, self.done, self.total)
+        eta = self.eta
+        if eta is not None:
+            text += ", {:.0f}s left".format(eta)
+        return text
+
+
+active_job = None
+
+# Events left to the interface while a job runs, for looking around the viewport
+NAVIGATION_EVENTS = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE', 'MOUSESMARTZOOM', 'NDOF_MOTION',
+    'NUMPAD_0', 'NUMPAD_1', 'NUMPAD_2', 'NUMPAD_3', 'NUMPAD_4', 'NUMPAD_5',
+    'NUMPAD_6', 'NUMPAD_7', 'NUMPAD_8', 'NUMPAD_9', 'NUMPAD_PERIOD',
+    'NUMPAD_PLUS', 'NUMPAD_MINUS', 'WINDOW_DEACTIVATE',
+}
+
+
+class BP_ModalFrameJob:
+    """Mixin that runs a frame-by-frame operator either at once or as a cancellable modal job.
+
+    Subclasses implement job_start, job_steps and job_finish. job_steps is a
+    generator that does one frame of work per iteration and yields
+    (frames done, total frames). Results are only written in job_finish, so
+    cancelling only has to restore the original frame.
+    """
+
+    def job_start(self, context):
+        self.original_frame = context.scene.frame_current
+
+    def job_steps(self, context):
+        return iter(())
+
+    def job_finish(self, context):
+        return {'FINISHED'}
+
+    def job_cancel(self, context):
+        context.scene.frame_set(self.original_frame)
+        return {'CANCELLED'}
+
+    def execute(self, context):
+        self.job_start(context)
+        for _ in self.job_steps(context):
+            pass
+        return self.job_finish(context)
+
+    def invoke(self, context, event):
+        global active_job
+
+        if active_job is not None:
+            self.report({'WARNING'}, "Another Balance Point job is running.")
+            return {'CANCELLED'}
+
+        self.job_start(context)
+        self._steps = self.job_steps(context)
+        active_job = JobProgress(self.bl_label)
+
+        wm = context.window_manager
+        wm.progress_begin(0, 1000)
+        self._timer = wm.event_timer_add(0.001, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.job_end(context)
+            return self.job_cancel(context)
+
+        if event.type in NAVIGATION_EVENTS:
+            return {'PASS_THROUGH'}
+
+        if event.type != 'TIMER':
+            # The job holds references to the group and rig across ticks, so
+            # edits, undo and frame changes wait until it ends
+            return {'RUNNING_MODAL'}
+
+        try:
+            for _ in range(context.scene.bp_com_properties.frames_per_tick):
+                active_job.done, active_job.total = next(self._steps)
+        except StopIteration:
+            self.job_end(context)
+            return self.job_finish(context)
+        except Exception:
+            # e.g. a mass object deleted or a bone renamed mid-job. End the job
+            # first, so later jobs can start.
+            self.job_end(context)
+            self.job_cancel(context)
+            raise
+
+        context.window_manager.progress_update(int(active_job.factor * 1000))
+        context.workspace.status_text_set("{} (Esc to cancel)".format(active_job.format()))
+        tag_redraw_sidebars(context)
+        return {'RUNNING_MODAL'}
+
+    def job_end(self, context):
+        global active_job
+
+        active_job = None
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        tag_redraw_sidebars(context)
+
+
+def tag_redraw_sidebars(context):
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
@@ -0,0 +1,192 @@
+import bpy
+import numpy as np
+from bpy_extras import anim_utils
+from mathutils import Euler, Quaternion
+
+
+def get_action_fcurves(obj):
+    anim_data = obj.animation_data
+    if anim_data is None or anim_data.action is None:
+        return None
+
+    action = anim_data.action
+    if hasattr(anim_utils, "action_get_channelbag_for_slot"):
+        channelbag = anim_utils.action_get_channelbag_for_slot(action, anim_data.action_slot)
+        return channelbag.fcurves if channelbag is not None else None
+
+    return action.fcurves
+
+
+def get_action_state(obj):
+    anim_data = obj.animation_data
+    if anim_data is None:
+        return None, None
+
+    return anim_data.action, getattr(anim_data, "action_slot", None)
+
+
+def set_action(obj, action, slot=None):
+    anim_data = obj.animation_data_create()
+    anim_data.action = action
+
+    if not hasattr(anim_data, "action_slot") or action is None:
+        return
+
+    if slot is None and anim_data.action_slot is None and len(anim_data.action_suitable_slots) > 0:
+        slot = anim_data.action_suitable_slots[0]
+    if slot is not None:
+        anim_data.action_slot = slot
+
+
+def get_key_tables(obj):
+    """Keyframe positions, handles and interpolation of every F-Curve on the object's action."""
+    fcurves = get_action_fcurves(obj)
+    if fcurves is None:
+        return None
+
+    tables = {}
+    for fcurve in fcurves:
+        points = fcurve.keyframe_points
+        count = len(points)
+        table = np.empty((count, 7))
+
+        for column, prop in ((0, "co"), (2, "handle_left"), (4, "handle_right")):
+            values = np.empty(count * 2, dtype=np.float32)
+            points.foreach_get(prop, values)
+            table[:, column:column + 2] = values.reshape(-1, 2)
+
+        interpolations = np.empty(count, dtype=np.int32)
+        points.foreach_get("interpolation", interpolations)
+        table[:, 6] = interpolations
+
+        tables[(fcurve.data_path, fcurve.array_index)] = (table, len(fcurve.modifiers) > 0)
+
+    return obj.animation_data.action.name, tables
+
+
+def get_rotation_data_path(pose_bone):
+    if pose_bone.rotation_mode == 'QUATERNION':
+        return "rotation_quaternion"
+    if pose_bone.rotation_mode == 'AXIS_ANGLE':
+        return "rotation_axis_angle"
+    return "rotation_euler"
+
+
+def get_rotation_values(rotation_mode, rotation, reference):
+    """Channel values for a quaternion rotation, kept continuous with the reference channel values."""
+    if rotation_mode == 'QUATERNION':
+        if rotation.dot(Quaternion(reference)) < 0:
+            rotation.negate()
+        return tuple(rotation)
+    if rotation_mode == 'AXIS_ANGLE':
+        axis, angle = rotation.to_axis_angle()
+        return (angle, *axis)
+    return tuple(rotation.to_euler(rotation_mode, Euler(reference, rotation_mode)))
+
+
+def get_bone_fcurves(rig, pose_bone, data_path):
+    fcurves = get_action_fcurves(rig)
+    if fcurves is None:
+        return None
+
+    data_path_full = pose_bone.path_from_id(data_path)
+    bone_fcurves = [fcurves.find(data_path_full, index=i) for i in range(len(getattr(pose_bone, data_path)))]
+
+    if any(fcurve is None for fcurve in bone_fcurves):
+        return None
+    return bone_fcurves
+
+
+def ensure_bone_fcurves(rig, pose_bone, data_path, frame):
+    bone_fcurves = get_bone_fcurves(rig, pose_bone, data_path)
+
+    if bone_fcurves is None:
+        # Let Blender create the action, slot and grouped F-Curves. The seed
+        # key sits inside the range that is about to be replaced.
+        pose_bone.keyframe_insert(data_path=data_path, index=-1, frame=frame, keytype='GENERATED')
+        bone_fcurves = get_bone_fcurves(rig, pose_bone, data_path)
+
+    return bone_fcurves
+
+
+def get_enum_value(struct, prop, identifier):
+    return struct.bl_rna.properties[prop].enum_items[identifier].value
+
+
+# Keyframe properties restored on kept keys: (name, values per key, dtype)
+KEYFRAME_PROPS = (
+    ("co", 2, np.float32),
+    ("handle_left", 2, np.float32),
+    ("handle_right", 2, np.float32),
+    ("handle_left_type", 1, np.int32),
+    ("handle_right_type", 1, np.int32),
+    ("interpolation", 1, np.int32),
+    ("type", 1, np.int32),
+    ("easing", 1, np.int32),
+    ("back", 1, np.float32),
+    ("amplitude", 1, np.float32),
+    ("period", 1, np.float32),
+)
+
+
+def get_keyframe_arrays(points):
+    arrays = {}
+    for prop, size, dtype in KEYFRAME_PROPS:
+        values = np.empty(len(points) * size, dtype=dtype)
+        points.foreach_get(prop, values)
+        arrays[prop] = values.reshape(-1, size)
+    return arrays
+
+
+def write_keys(fcurves, frames, values, keytype='GENERATED'):
+    """Replace the keys of each F-Curve inside the frame range with one key per frame.
+
+    values holds one row per frame and one column per F-Curve. Keys outside
+    the range are read, the curve is cleared, and the kept and new keys are
+    written back together.
+    """
+    if len(frames) == 0:
+        return
+
+    frames = np.asarray(frames, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32).reshape(len(frames), -1)
+    frame_start, frame_end = frames.min(), frames.max()
+
+    interpolation = get_enum_value(
+        bpy.types.Keyframe, "interpolation", bpy.context.preferences.edit.keyframe_new_interpolation_type)
+    key_type = get_enum_value(bpy.types.Keyframe, "type", keytype)
+
+    for channel, fcurve in enumerate(fcurves):
+        points = fcurve.keyframe_points
+        kept = get_keyframe_arrays(points)
+        key_frames = kept["co"][:, 0]
+        outside = (key_frames < frame_start - 1e-4) | (key_frames > frame_end + 1e-4)
+        kept = {prop: array[outside] for prop, array in kept.items()}
+        kept_count = int(outside.sum())
+
+        points.clear()
+        points.add(kept_count + len(frames))
+
+        # New keys keep the defaults add() gave them, apart from these
+        arrays = get_keyframe_arrays(points)
+        for prop, array in kept.items():
+            arrays[prop][:kept_count] = array
+        arrays["co"][kept_count:, 0] = frames
+        arrays["co"][kept_count:, 1] = values[:, channel]
+        arrays["interpolation"][kept_count:] = interpolation
+        arrays["type"][kept_count:] = key_type
+
+        for prop, array in arrays.items():
+            points.foreach_set(prop, array.ravel())
+
+        # Sorts the new points into place and recalculates handles once
+        fcurve.update()
+
+
+def write_bone_keys(rig, pose_bone, data_path, frames, values, keytype='GENERATED'):
+    if len(frames) == 0:
+        return
+
+    bone_fcurves = ensure_bone_fcurves(rig, pose_bone, data_path, int(frames[0]))
+    write_keys(bone_fcurves, frames, values, keytype)
+
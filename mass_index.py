@@ -0,0 +1,199 @@
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from mathutils import Matrix
+
+
+_mass_indices = {}
+
+
+def get_mass_radius(volume):
+    return np.cbrt((3 * np.maximum(volume, 0.0)) / (4 * np.pi)) / 10
+
+
+class MassIndex:
+    """Resolved active mass objects of a Mass Object Group and their effective masses."""
+
+    def __init__(self, group):
+        self.key = get_group_key(group)
+        self.objects = []
+        self.sources = []
+        self.candidates = set()
+        self.mass_settings = {}
+        masses = []
+        unweighted_masses = []
+        volumes = []
+
+        for mass_collection in group.mass_collections:
+            collection = mass_collection.mass_object_collection
+            if collection is None:
+                continue
+
+            objects = collection.all_objects
+            active = []
+            for index, obj in enumerate(objects):
+                self.candidates.add(obj.as_pointer())
+                self.mass_settings[obj.as_pointer()] = get_mass_settings(obj)
+                if obj.get("active"):
+                    vol = obj.get("volume", 0.0)
+                    obj_mass = obj.get("density", 0.0) * vol
+                    self.objects.append(obj)
+                    unweighted_masses.append(obj_mass)
+                    masses.append(obj_mass * mass_collection.influence)
+                    volumes.append(vol)
+                    active.append(index)
+
+            if active:
+                self.sources.append((collection, len(objects), np.array(active)))
+
+        # Objects whose updates can move or change the group's masses
+        self.dependencies = set(self.candidates)
+        for obj in self.objects:
+            parent = obj.parent
+            while parent is not None:
+                self.dependencies.add(parent.as_pointer())
+                parent = parent.parent
+
+        self.masses = np.array(masses, dtype=np.float64)
+        self.unweighted_masses = np.array(unweighted_masses, dtype=np.float64)
+        self.radii = get_mass_radius(np.array(volumes, dtype=np.float64))
+
+        # Bone-attached masses
+        rig = group.pinned_rig
+        self.bone_rig = None
+        if group.use_bone_masses and rig is not None and rig.type == 'ARMATURE':
+            self.bone_rig = rig
+            self.bone_indices = np.full(len(self.objects), -1)
+            self.bone_offsets = np.zeros((len(self.objects), 3))
+            bone_lookup = {pose_bone.name: index for index, pose_bone in enumerate(rig.pose.bones)}
+
+            for i, obj in enumerate(self.objects):
+                if obj.parent == rig and obj.parent_type == 'BONE' and obj.parent_bone in bone_lookup:
+                    # Bone parenting attaches children to the bone's tail
+                    bone = rig.data.bones[obj.parent_bone]
+                    offset = Matrix.Translation((0.0, bone.length, 0.0)) @ obj.matrix_parent_inverse @ obj.matrix_basis
+                    self.bone_indices[i] = bone_lookup[obj.parent_bone]
+                    self.bone_offsets[i] = offset.translation
+
+    def __len__(self):
+        return len(self.objects)
+
+    @property
+    def members(self):
+        return list(zip(self.objects, self.masses))
+
+    def is_stale(self):
+        return any(len(collection.all_objects) != count for collection, count, _ in self.sources)
+
+    def positions(self):
+        if self.bone_rig is not None:
+            return self.bone_positions()
+
+        positions = []
+
+        for collection, count, active in self.sources:
+            matrices = np.empty(count * 16, dtype=np.float32)
+            collection.all_objects.foreach_get("matrix_world", matrices)
+            positions.append(matrices.reshape(-1, 16)[active, 12:15])
+
+        if positions:
+            return np.concatenate(positions).astype(np.float64)
+        return np.zeros((0, 3))
+
+    def bone_positions(self):
+        rig = self.bone_rig
+        positions = np.empty((len(self.objects), 3))
+        attached = self.bone_indices >= 0
+
+        if attached.any():
+            pose_bones = rig.pose.bones
+            matrices = np.empty(len(pose_bones) * 16, dtype=np.float32)
+            pose_bones.foreach_get("matrix", matrices)
+
+            # Flat matrices are column-major
+            bone_matrices = matrices.reshape(-1, 4, 4).transpose(0, 2, 1)[self.bone_indices[attached]]
+            local_positions = np.einsum('nij,nj->ni', bone_matrices[:, :3, :3], self.bone_offsets[attached]) + bone_matrices[:, :3, 3]
+
+            rig_matrix = np.array(rig.matrix_world)
+            positions[attached] = local_positions @ rig_matrix[:3, :3].T + rig_matrix[:3, 3]
+
+        # Masses that are not bone children of the rig still follow their objects
+        for i in np.flatnonzero(~attached):
+            positions[i] = self.objects[i].matrix_world.translation
+
+        return positions
+
+
+def get_mass_settings(obj):
+    return (bool(obj.get("active")), obj.get("density", 0.0), obj.get("volume", 0.0))
+
+
+def get_group_key(group):
+    collections = tuple(
+        (mc.mass_object_collection.name if mc.mass_object_collection is not None else None, mc.influence)
+        for mc in group.mass_collections)
+    rig_name = group.pinned_rig.name if group.pinned_rig is not None else None
+    return (collections, group.use_bone_masses, rig_name)
+
+
+def get_mass_index(group):
+    index_id = (group.id_data.name, group.name)
+    index = _mass_indices.get(index_id)
+
+    try:
+        if index is None or index.key != get_group_key(group) or index.is_stale():
+            index = None
+    except ReferenceError:
+        index = None
+
+    if index is None:
+        index = MassIndex(group)
+        _mass_indices[index_id] = index
+
+    return index
+
+
+def invalidate_mass_index(group=None):
+    if group is None:
+        _mass_indices.clear()
+    else:
+        _mass_indices.pop((group.id_data.name, group.name), None)
+
+
+@persistent
+def update_mass_index(scene, depsgraph):
+    if not _mass_indices:
+        return
+
+    updated_objects = set()
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection):
+            # Collection contents changed
+            _mass_indices.clear()
+            return
+
+        if isinstance(update.id, bpy.types.Object):
+            updated_objects.add(update.id.original.as_pointer())
+
+    for update in depsgraph.updates:
+        if not isinstance(update.id, bpy.types.Object):
+            continue
+
+        pointer = update.id.original.as_pointer()
+        for index_id, index in list(_mass_indices.items()):
+            if pointer not in index.candidates:
+                continue
+
+            if index.mass_settings.get(pointer) != get_mass_settings(update.id.original):
+                # Active, density or volume edited. RNA edits of these tag the
+                # object's transform too, so the update flags can't tell.
+                del _mass_indices[index_id]
+            elif index.bone_rig is not None and index.bone_rig.as_pointer() not in updated_objects:
+                # A bone-attached mass moved on its own, so its bone offset changed
+                del _mass_indices[index_id]
+
+
+@persistent
+def clear_mass_index(*args):
+    _mass_indices.clear()
@@ -1,4 +1,5 @@
 import bpy
+from .mass_index import invalidate_mass_index
 
 
 class AddMassProps(bpy.types.Operator):
@@ -25,6 +26,7 @@ class AddMassProps(bpy.types.Operator):
                     obj["density"] = 1.0
                 if obj.get("volume") is None:
                     obj["volume"] = 1.0
+        invalidate_mass_index()
         return {'FINISHED'}
 
 
@@ -52,6 +54,7 @@ class RemoveMassProps(bpy.types.Operator):
                     del obj["density"]
                 if obj.get("volume") is not None:
                     del obj["volume"]
+        invalidate_mass_index()
         return {'FINISHED'}
 
 
@@ -140,6 +143,7 @@ class CalculateVolume(bpy.types.Operator):
         for obj in sel_obj:
             if obj.get("volume") is not None and obj.type == 'MESH':
                 obj["volume"] = get_volume(obj) * 1000
+        invalidate_mass_index()
         return {'FINISHED'}
 
 
@@ -163,11 +167,13 @@ class SetDensity(bpy.types.Operator):
         for obj in sel_obj:
             if obj.get("density") is not None:
                 obj["density"] = com_props.mass_density_set
+        invalidate_mass_index()
         return {'FINISHED'}
 
 
 def set_active(obj, act):
     obj["active"] = act
+    invalidate_mass_index()
     if act:
         obj.display_type = 'SOLID'
     elif act == False:
@@ -0,0 +1,208 @@
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from .keyframes import get_key_tables
+
+
+# Motion paths are stored on the Mass Object Group as ID property arrays:
+# packed XYZ points, plus the frame of the first point and the frame step.
+PATH_KEY = "bp_motion_path"
+START_KEY = "bp_motion_path_start"
+STRIDE_KEY = "bp_motion_path_stride"
+
+
+def has_motion_path(group):
+    return PATH_KEY in group or len(group.motion_path_points) > 0
+
+
+def get_motion_path_points(group):
+    """(N, 3) view of the group's motion path. Writing to it updates the stored path in place."""
+    data = group.get(PATH_KEY)
+
+    if data is not None:
+        return np.asarray(data).reshape(-1, 3)
+
+    # Paths calculated before the packed storage, until they are migrated
+    legacy_points = group.motion_path_points
+    points = np.empty(len(legacy_points) * 3, dtype=np.float64)
+    legacy_points.foreach_get("point_location", points)
+    return points.reshape(-1, 3)
+
+
+def get_motion_path_range(group):
+    """Frame of the first point and frame step of the group's motion path."""
+    if PATH_KEY in group:
+        return group.get(START_KEY, 0), group.get(STRIDE_KEY, 1)
+    return group.motion_path_frame_start, 1
+
+
+def get_motion_path_frames(group):
+    start, stride = get_motion_path_range(group)
+    return start + stride * np.arange(len(get_motion_path_points(group)))
+
+
+def set_motion_path(group, frame_start, points, stride=1):
+    group[PATH_KEY] = np.ascontiguousarray(points, dtype=np.float64).ravel()
+    group[START_KEY] = int(frame_start)
+    group[STRIDE_KEY] = int(stride)
+
+    if len(group.motion_path_points) > 0:
+        group.motion_path_points.clear()
+
+    watch_motion_path(group)
+
+
+def clear_motion_path(group):
+    for key in (PATH_KEY, START_KEY, STRIDE_KEY):
+        if key in group:
+            del group[key]
+
+    group.motion_path_points.clear()
+    watch_motion_path(group)
+
+
+def migrate_motion_path(group):
+    if PATH_KEY not in group and len(group.motion_path_points) > 0:
+        set_motion_path(group, group.motion_path_frame_start, get_motion_path_points(group))
+
+
+@persistent
+def migrate_motion_paths(*args):
+    for scene in bpy.data.scenes:
+        for group in scene.bp_mass_object_groups:
+            migrate_motion_path(group)
+
+
+# Key edit tracking
+
+# Indices of path points that key edits made out of date, per group. They are
+# only recalculated by the Update Motion Path operator: changing frames from
+# a handler or timer would discard unkeyed edits on animated channels.
+_key_tables = {}
+_pending = {}
+
+
+def get_group_id(group):
+    return (group.id_data.name, group.name)
+
+
+def get_changed_interval(old_table, new_table):
+    """Frame interval whose evaluation can differ between two key tables of one F-Curve.
+
+    A key's position and handles shape the segments to its neighboring keys,
+    so the interval runs from the last unchanged key before the first change
+    to the first unchanged key after the last change. Changes to the first or
+    last key also change the extrapolation beyond it.
+    """
+    common = min(len(old_table), len(new_table))
+    unchanged = np.all(np.isclose(old_table[:common], new_table[:common]), axis=1)
+
+    prefix = common if unchanged.all() else int(np.argmin(unchanged))
+    if prefix == len(old_table) == len(new_table):
+        return None
+
+    old_suffix = old_table[prefix:][::-1]
+    new_suffix = new_table[prefix:][::-1]
+    common = min(len(old_suffix), len(new_suffix))
+    unchanged = np.all(np.isclose(old_suffix[:common], new_suffix[:common]), axis=1)
+    suffix = common if unchanged.all() else int(np.argmin(unchanged))
+
+    frame_start = new_table[prefix - 1, 0] if prefix > 0 else -np.inf
+    frame_end = new_table[len(new_table) - suffix, 0] if suffix > 0 else np.inf
+    return frame_start, frame_end
+
+
+def get_dirty_interval(old_tables, new_tables):
+    if old_tables is None or new_tables is None or old_tables[0] != new_tables[0]:
+        # Action assigned, removed or swapped
+        return -np.inf, np.inf
+
+    intervals = []
+    old_tables, new_tables = old_tables[1], new_tables[1]
+
+    for key in old_tables.keys() | new_tables.keys():
+        if key not in old_tables or key not in new_tables:
+            return -np.inf, np.inf
+
+        (old_table, _), (new_table, has_modifiers) = old_tables[key], new_tables[key]
+        interval = get_changed_interval(old_table, new_table)
+        if interval is not None:
+            if has_modifiers:
+                # Modifiers like Cycles can repeat a key anywhere
+                return -np.inf, np.inf
+            intervals.append(interval)
+
+    if not intervals:
+        return None
+    return min(i[0] for i in intervals), max(i[1] for i in intervals)
+
+
+def watch_motion_path(group):
+    """Record the rig's keys so later edits can be compared against them."""
+    rig = group.pinned_rig
+
+    if group.motion_path_track_edits and rig is not None and has_motion_path(group):
+        # Pending points are written in place, which needs the packed storage
+        migrate_motion_path(group)
+        _key_tables[get_group_id(group)] = get_key_tables(rig)
+    else:
+        _key_tables.pop(get_group_id(group), None)
+        _pending.pop(get_group_id(group), None)
+
+
+def get_pending_indices(group):
+    """Indices of the group's path points that key edits made out of date."""
+    return _pending.get(get_group_id(group), np.empty(0, dtype=np.int64))
+
+
+def resolve_pending_indices(group, indices):
+    """Mark the given points as recalculated."""
+    group_id = get_group_id(group)
+    if group_id in _pending:
+        remaining = np.setdiff1d(_pending[group_id], indices)
+        if len(remaining) > 0:
+            _pending[group_id] = remaining
+        else:
+            del _pending[group_id]
+
+
+@persistent
+def update_motion_paths(scene, depsgraph):
+    updated_actions = {update.id.original.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Action)}
+
+    for group in scene.bp_mass_object_groups:
+        group_id = get_group_id(group)
+        rig = group.pinned_rig
+        if group_id not in _key_tables or rig is None:
+            continue
+
+        # Only key edits and action changes can move the path, frame changes
+        # and transforms update the rig without touching its action
+        old_tables = _key_tables[group_id]
+        old_action = old_tables[0] if old_tables is not None else None
+        anim_data = rig.animation_data
+        action = anim_data.action.name if anim_data is not None and anim_data.action is not None else None
+        if action == old_action and old_action not in updated_actions:
+            continue
+
+        new_tables = get_key_tables(rig)
+        dirty = get_dirty_interval(old_tables, new_tables)
+        _key_tables[group_id] = new_tables
+        if dirty is None:
+            continue
+
+        # Path points inside the dirty interval
+        frames = get_motion_path_frames(group)
+        indices = np.flatnonzero((frames >= dirty[0]) & (frames <= dirty[1]))
+        if len(indices) > 0:
+            _pending[group_id] = np.union1d(_pending.get(group_id, indices), indices)
+
+
+@persistent
+def refresh_motion_path_watch(*args):
+    _key_tables.clear()
+    _pending.clear()
+
+    for scene in bpy.data.scenes:
+        for group in scene.bp_mass_object_groups:
+            watch_motion_path(group)
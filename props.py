@@ -1,4 +1,14 @@
 import bpy
+from .motion_path import watch_motion_path
+from .com_cache import invalidate_com_timeline
+
+
+def update_motion_path_watch(self, context):
+    watch_motion_path(self)
+
+
+def update_com_cache(self, context):
+    invalidate_com_timeline(self)
 
 
 class BP_MotionPathPoint(bpy.types.PropertyGroup):
@@ -18,6 +28,11 @@ class BP_RootControlBones(bpy.types.PropertyGroup):
         name="Motion Bone", description="Non-root bone that drives character movement.")
 
 
+class BP_BatchAction(bpy.types.PropertyGroup):
+    action: bpy.props.PointerProperty(
+        name="Action", description="Action to bake the group's rig with during batch baking.", type=bpy.types.Action)
+
+
 class BPMassObjectGroup(bpy.types.PropertyGroup):
     visible: bpy.props.BoolProperty(name="Visible", default=True)
     com_floor_level: bpy.props.FloatProperty(name="Floor Level", default=0.0)
@@ -31,6 +46,10 @@ class BPMassObjectGroup(bpy.types.PropertyGroup):
         name="COM Object", type=bpy.types.Object)
     pinned_rig: bpy.props.PointerProperty(
         name="Armature", type=bpy.types.Object)
+    use_bone_masses: bpy.props.BoolProperty(
+        name="Bone-Attached Masses", description="Compute mass positions from the pinned rig's pose bones instead of evaluating mass objects. Mass objects must be bone children of the pinned rig.", default=False)
+    use_com_cache: bpy.props.BoolProperty(
+        name="Cache COM Timeline", description="Keep the center of mass of every played frame of the scene range for faster playback. Fill COM Cache evaluates the remaining frames. Edits clear the cache.", default=False, update=update_com_cache)
     show_axis: bpy.props.BoolProperty(name="Show Rotation Axis", default=False)
     initial_axis: bpy.props.FloatVectorProperty(
         name="Initial Rotation Axis", subtype='XYZ', default=(1, 0, 0, ))
@@ -62,10 +81,27 @@ class BPMassObjectGroup(bpy.types.PropertyGroup):
         name="End", description="First frame of the physics baking range.")
     frame_rate: bpy.props.IntProperty(name="Frame Rate", default=24, min=1)
     substeps: bpy.props.IntProperty(name="Substeps", description="Substeps for physics baking. More substeps leads to more accuracy.", default=20, min=1)
+    integrator: bpy.props.EnumProperty(name="Integrator", description="Method used to integrate the root rotation during physics baking.", items=(
+        ('EULER', "Explicit Euler", "First-order rotation steps. Needs the most substeps"),
+        ('RK4', "Runge-Kutta 4", "Fourth-order steps on the rotation quaternion"),
+        ('LIE_MIDPOINT', "Lie Midpoint", "Second-order explicit steps along the rotation group. Kinetic energy drifts slowly"),
+        ('IMPLICIT_MIDPOINT', "Implicit Midpoint", "Second-order implicit steps along the rotation group that conserve kinetic energy"),
+    ), default='EULER')
+    adaptive_substeps: bpy.props.BoolProperty(
+        name="Adaptive Substeps", description="Choose the number of rotation substeps per frame from an error estimate. Substeps sets the starting step size.", default=False)
+    substep_tolerance: bpy.props.FloatProperty(
+        name="Substep Tolerance", description="Largest rotation error in radians allowed per adaptive substep.", default=1e-5, min=1e-9, precision=6)
+    batch_bake: bpy.props.BoolProperty(
+        name="Include in Batch Bake", description="Bake this group when running Batch Bake Physics.", default=False)
+    batch_actions: bpy.props.CollectionProperty(type=BP_BatchAction)
     motion_path_frame_start: bpy.props.IntProperty(
         name="Motion Path Range Start", description="First frame of the calculated motion path range.", default=0)
     motion_path_frame_end: bpy.props.IntProperty(
         name="Motion Path Range End", description="Last frame of the calculated motion path range.", default=10)
+    motion_path_frame_step: bpy.props.IntProperty(
+        name="Motion Path Frame Step", description="Number of frames between calculated motion path points.", default=1, min=1)
+    motion_path_track_edits: bpy.props.BoolProperty(
+        name="Track Motion Path Edits", description="Track key edits on the pinned rig's action, so Update Motion Path recalculates only the affected frames.", default=False, update=update_motion_path_watch)
     root_motion_frame_start: bpy.props.IntProperty(
         name="Root Motion Range Start", description="First frame of the root motion baking path range.", default=0)
     root_motion_frame_end: bpy.props.IntProperty(
@@ -106,4 +142,8 @@ class BPComProperties(bpy.types.PropertyGroup):
         name="Drawing Opacity", default=1.0, min=0.0, max=1.0)
     draw_volume: bpy.props.BoolProperty(name="Draw Volume", default=False)
     volume_color : bpy.props.FloatVectorProperty(name="Volume Color", description="Color of Volume Shapes", size=4, default=(
-        1.0, 1.0, 1.0, 0.2), subtype='COLOR', min=0.0, max=1.0)
\ No newline at end of file
+        1.0, 1.0, 1.0, 0.2), subtype='COLOR', min=0.0, max=1.0)
+    use_disk_cache: bpy.props.BoolProperty(
+        name="Disk Cache", description="Keep sampled transforms in a cache folder next to the .blend file, so they are reused after reopening it. Entries for changed animation are deleted.", default=False)
+    frames_per_tick: bpy.props.IntProperty(
+        name="Frames Per Update", description="Frames processed between interface updates while baking or calculating motion paths. Press Esc to cancel.", default=10, min=1)
\ No newline at end of file
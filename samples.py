@@ -0,0 +1,449 @@
+import bpy
+import hashlib
+import numpy as np
+from bpy.app.handlers import persistent
+from .disk_cache import save_arrays, update_rows, load_arrays
+from .keyframes import get_key_tables
+from .mass_index import get_mass_index, get_group_key
+
+
+_transform_samples = {}
+
+# Fingerprints computed since the last depsgraph update or key write, per group
+_fingerprints = {}
+
+OBJECT_TRANSFORM_PATHS = {
+    "location", "rotation_euler", "rotation_quaternion", "rotation_axis_angle", "scale",
+    "delta_location", "delta_rotation_euler", "delta_rotation_quaternion", "delta_scale",
+}
+
+
+class TransformSamples:
+    """World positions of a group's mass objects, and optionally its rig's pose bones, over a frame range.
+
+    Rows are per frame. Bone matrices are in armature space, and the bone
+    channel arrays hold each pose bone's location and rotation channels.
+    """
+
+    BONE_CHANNELS = (
+        ("location", 3),
+        ("rotation_quaternion", 4),
+        ("rotation_euler", 3),
+        ("rotation_axis_angle", 4),
+    )
+
+    def __init__(self, group, fingerprint, frame_start, frame_end, include_bones):
+        index = get_mass_index(group)
+        rig = group.pinned_rig
+
+        self.group_id = (group.id_data.name, group.name)
+        self.fingerprint = fingerprint
+        self.rig = rig
+        self.include_bones = include_bones
+        self.bone_names = [pose_bone.name for pose_bone in rig.pose.bones] if include_bones else []
+        self._index = index
+        self._allocate(frame_start, frame_end)
+
+        # Frame range and bones of the disk cache entry, None if there is none
+        self.disk_layout = None
+
+    def _allocate(self, frame_start, frame_end):
+        frame_count = frame_end - frame_start + 1
+
+        self.frame_start = frame_start
+        self.filled = np.zeros(frame_count, dtype=bool)
+        self.changed = np.zeros(frame_count, dtype=bool)
+        self.positions = np.zeros((frame_count, len(self._index), 3))
+        self.rig_matrices = np.zeros((frame_count, 4, 4))
+        self._allocate_bones(frame_count)
+
+    def _allocate_bones(self, frame_count):
+        bone_count = len(self.bone_names)
+
+        self.bone_matrices = np.zeros((frame_count, bone_count, 4, 4), dtype=np.float32)
+        self.bone_channels = {
+            data_path: np.zeros((frame_count, bone_count, size), dtype=np.float32)
+            for data_path, size in self.BONE_CHANNELS}
+
+    def get_arrays(self):
+        arrays = {
+            "filled": self.filled,
+            "positions": self.positions,
+            "rig_matrices": self.rig_matrices,
+            "bone_matrices": self.bone_matrices,
+        }
+        for data_path, channels in self.bone_channels.items():
+            arrays["bone_" + data_path] = channels
+        return arrays
+
+    def set_arrays(self, frame_start, arrays):
+        self.frame_start = frame_start
+        self.filled = arrays["filled"]
+        self.positions = arrays["positions"]
+        self.rig_matrices = arrays["rig_matrices"]
+        self.bone_matrices = arrays["bone_matrices"]
+        self.bone_channels = {data_path: arrays["bone_" + data_path] for data_path, _ in self.BONE_CHANNELS}
+
+        if len(self.changed) != len(self.filled):
+            self.changed = np.zeros(len(self.filled), dtype=bool)
+
+    def release_mapped_arrays(self):
+        """Copy arrays mapped from the disk cache into memory, so their files can be replaced."""
+        self.set_arrays(self.frame_start, {
+            name: np.array(array) if isinstance(array, np.memmap) else array
+            for name, array in self.get_arrays().items()})
+
+    def get_layout(self):
+        return int(self.frame_start), len(self.filled), self.include_bones
+
+    def get_metadata(self):
+        return {
+            "frame_start": int(self.frame_start),
+            "include_bones": self.include_bones,
+            "bone_names": self.bone_names,
+            "object_count": len(self._index),
+        }
+
+    @property
+    def frame_end(self):
+        return self.frame_start + len(self.filled) - 1
+
+    def covers(self, frame_start, frame_end):
+        return self.frame_start <= frame_start and frame_end <= self.frame_end
+
+    def extend(self, frame_start, frame_end, include_bones=False):
+        """Grow the range to include frame_start..frame_end, keeping the sampled frames.
+
+        Adding bones keeps the range, but frames sampled without them have
+        to be sampled again.
+        """
+        if include_bones and not self.include_bones:
+            self.include_bones = True
+            self.bone_names = [pose_bone.name for pose_bone in self.rig.pose.bones]
+            self._allocate_bones(len(self.filled))
+            self.filled[:] = False
+
+        if self.covers(frame_start, frame_end):
+            return
+
+        old = (self.frame_start, self.filled, self.positions, self.rig_matrices, self.bone_matrices, self.bone_channels)
+        self._allocate(min(frame_start, self.frame_start), max(frame_end, self.frame_end))
+
+        old_start, old_filled, old_positions, old_rig_matrices, old_bone_matrices, old_bone_channels = old
+        rows = slice(old_start - self.frame_start, old_start - self.frame_start + len(old_filled))
+        self.filled[rows] = old_filled
+        self.positions[rows] = old_positions
+        self.rig_matrices[rows] = old_rig_matrices
+        self.bone_matrices[rows] = old_bone_matrices
+        for data_path, channels in old_bone_channels.items():
+            self.bone_channels[data_path][rows] = channels
+
+    def rows(self, frames):
+        return np.asarray(frames) - self.frame_start
+
+    def missing_frames(self, frame_start, frame_end, frame_step=1):
+        frames = np.arange(frame_start, frame_end + 1, frame_step)
+        return frames[~self.filled[self.rows(frames)]]
+
+    def sample(self, frame):
+        i = frame - self.frame_start
+
+        self.positions[i] = self._index.positions()
+
+        if self.rig is not None:
+            self.rig_matrices[i] = self.rig.matrix_world
+
+        if self.include_bones:
+            pose_bones = self.rig.pose.bones
+            bone_count = len(pose_bones)
+
+            # Flat matrices are column-major
+            matrices = np.empty(bone_count * 16, dtype=np.float32)
+            pose_bones.foreach_get("matrix", matrices)
+            self.bone_matrices[i] = matrices.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+            for data_path, size in self.BONE_CHANNELS:
+                channels = np.empty(bone_count * size, dtype=np.float32)
+                pose_bones.foreach_get(data_path, channels)
+                self.bone_channels[data_path][i] = channels.reshape(-1, size)
+
+        self.filled[i] = True
+        self.changed[i] = True
+
+    def coms(self, frames, masses):
+        """Mass-weighted center of each of the given frames."""
+        positions = self.positions[self.rows(frames)]
+        total_mass = masses.sum()
+        if total_mass > 0:
+            return np.einsum('n,fni->fi', masses, positions) / total_mass
+        return np.zeros((len(positions), 3))
+
+
+def iter_transform_samples(scene, samples, frames):
+    for index, frame in enumerate(frames):
+        scene.frame_set(int(frame))
+        samples.sample(frame)
+        yield index + 1, len(frames)
+
+    if scene.bp_com_properties.use_disk_cache:
+        save_transform_samples(samples)
+
+
+def save_transform_samples(samples):
+    """Write the frames sampled since the last save to the disk cache."""
+    rows = np.flatnonzero(samples.changed)
+    if len(rows) == 0:
+        return
+
+    # Same layout as the entry on disk: write only the new rows
+    if samples.disk_layout == samples.get_layout() and update_rows(*samples.group_id, samples.fingerprint, rows, samples.get_arrays()):
+        samples.changed[:] = False
+        return
+
+    # The entry's files are replaced, which fails while they are mapped
+    samples.release_mapped_arrays()
+    if not save_arrays(*samples.group_id, samples.fingerprint, samples.get_metadata(), samples.get_arrays()):
+        return
+
+    samples.changed[:] = False
+    samples.disk_layout = samples.get_layout()
+
+    # Map the new files, so the samples stop holding the arrays in memory
+    entry = load_arrays(*samples.group_id, samples.fingerprint)
+    if entry is not None:
+        samples.set_arrays(samples.frame_start, entry[1])
+
+
+def load_transform_samples(group, fingerprint, include_bones):
+    """Transform samples mapped from the disk cache, or None if there is no usable entry."""
+    entry = load_arrays(group.id_data.name, group.name, fingerprint)
+    if entry is None:
+        return None
+
+    metadata, arrays = entry
+    rig = group.pinned_rig
+    if metadata["include_bones"] and (rig is None or rig.type != 'ARMATURE'):
+        return None
+    if include_bones and not metadata["include_bones"]:
+        return None
+
+    samples = TransformSamples(group, fingerprint, metadata["frame_start"], metadata["frame_start"], metadata["include_bones"])
+    if samples.bone_names != metadata["bone_names"] or len(samples._index) != metadata["object_count"]:
+        return None
+
+    samples.set_arrays(metadata["frame_start"], arrays)
+    samples.disk_layout = samples.get_layout()
+    return samples
+
+
+def get_rna_state(struct):
+    """Values of a struct's properties, with ID pointers by name, for hashing."""
+    state = []
+
+    for prop in struct.bl_rna.properties:
+        identifier = prop.identifier
+        # Read-only values like solver errors change as the scene evaluates
+        if identifier == "rna_type" or prop.type == 'COLLECTION' or prop.is_readonly:
+            continue
+
+        value = getattr(struct, identifier, None)
+        if prop.type == 'POINTER':
+            value = value.name if isinstance(value, bpy.types.ID) else None
+        elif prop.type == 'ENUM' and prop.is_enum_flag:
+            value = sorted(value)
+        elif getattr(prop, "is_array", False):
+            value = np.array(value, dtype=np.float64).ravel().tolist()
+        state.append((identifier, value))
+
+    return state
+
+
+def get_constraints(obj):
+    constraints = list(obj.constraints)
+    if obj.type == 'ARMATURE' and obj.pose is not None:
+        for pose_bone in obj.pose.bones:
+            constraints.extend(pose_bone.constraints)
+    return constraints
+
+
+def get_drivers(obj):
+    anim_data = obj.animation_data
+    return list(anim_data.drivers) if anim_data is not None else []
+
+
+def get_linked_objects(obj):
+    """Objects whose transforms can move obj: its parent, constraint targets and driver targets."""
+    linked = [obj.parent] if obj.parent is not None else []
+
+    for constraint in get_constraints(obj):
+        for prop in constraint.bl_rna.properties:
+            if prop.type == 'POINTER' and isinstance(getattr(constraint, prop.identifier, None), bpy.types.Object):
+                linked.append(getattr(constraint, prop.identifier))
+        # Armature constraints keep their targets in a collection
+        for target in getattr(constraint, "targets", ()):
+            if isinstance(getattr(target, "target", None), bpy.types.Object):
+                linked.append(target.target)
+
+    for fcurve in get_drivers(obj):
+        for variable in fcurve.driver.variables:
+            for target in variable.targets:
+                if isinstance(target.id, bpy.types.Object):
+                    linked.append(target.id)
+
+    return linked
+
+
+def get_fingerprint_objects(group):
+    objects = {}
+    queue = list(get_mass_index(group).objects)
+
+    rig = group.pinned_rig
+    if rig is not None:
+        queue.append(rig)
+
+    while queue:
+        obj = queue.pop()
+        if obj.name not in objects:
+            objects[obj.name] = obj
+            queue.extend(get_linked_objects(obj))
+
+    return [objects[name] for name in sorted(objects)]
+
+
+def update_constraint_fingerprint(fingerprint, obj):
+    for constraint in get_constraints(obj):
+        fingerprint.update(repr(get_rna_state(constraint)).encode())
+        for target in getattr(constraint, "targets", ()):
+            fingerprint.update(repr(get_rna_state(target)).encode())
+
+
+def update_driver_fingerprint(fingerprint, obj):
+    for fcurve in get_drivers(obj):
+        driver = fcurve.driver
+        fingerprint.update(repr((fcurve.data_path, fcurve.array_index, fcurve.mute, driver.type, driver.expression, driver.use_self)).encode())
+
+        for variable in driver.variables:
+            fingerprint.update(repr((variable.name, variable.type)).encode())
+            for target in variable.targets:
+                fingerprint.update(repr((
+                    target.id.name if target.id is not None else None, target.data_path, target.bone_target,
+                    target.transform_type, target.transform_space, target.rotation_mode)).encode())
+
+                # Properties of other data are hashed by their current value
+                if target.id is not None and not isinstance(target.id, bpy.types.Object) and target.data_path:
+                    try:
+                        value = target.id.path_resolve(target.data_path)
+                    except ValueError:
+                        value = None
+                    fingerprint.update(repr(value).encode())
+
+        # Keys and modifiers that map the driver's value
+        points = fcurve.keyframe_points
+        table = np.empty(len(points) * 2, dtype=np.float32)
+        points.foreach_get("co", table)
+        fingerprint.update(table.tobytes())
+        fingerprint.update(repr([get_rna_state(modifier) for modifier in fcurve.modifiers]).encode())
+
+
+def update_rest_fingerprint(fingerprint, armature):
+    bones = armature.bones
+    fingerprint.update(repr([
+        (bone.name, bone.parent.name if bone.parent is not None else None, bone.length,
+         bone.use_connect, bone.use_inherit_rotation, bone.inherit_scale, bone.use_local_location)
+        for bone in bones]).encode())
+
+    matrices = np.empty(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get("matrix_local", matrices)
+    fingerprint.update(matrices.tobytes())
+
+
+def get_animation_fingerprint(group):
+    """Hash of everything the group's sampled transforms depend on.
+
+    Covers the group's mass settings and the active mass objects, the pinned
+    rig and every object that can move them through parenting, constraints
+    or drivers: each object's parenting, constraints, drivers, action keys,
+    rest pose and the transforms that are neither animated nor driven.
+    Drivers reading animated properties of data other than objects are
+    hashed by their value on the current frame only.
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(repr((group.id_data.name, get_group_key(group))).encode())
+    fingerprint.update(repr([obj.name for obj in get_mass_index(group).objects]).encode())
+
+    for obj in get_fingerprint_objects(group):
+        parent_name = obj.parent.name if obj.parent is not None else None
+        fingerprint.update(repr((obj.name, parent_name, obj.parent_type, obj.parent_bone)).encode())
+        fingerprint.update(np.array(obj.matrix_parent_inverse, dtype=np.float32).tobytes())
+
+        update_constraint_fingerprint(fingerprint, obj)
+        update_driver_fingerprint(fingerprint, obj)
+
+        # Driven transforms change from frame to frame, like animated ones
+        animated_paths = {fcurve.data_path for fcurve in get_drivers(obj)}
+        key_tables = get_key_tables(obj)
+        if key_tables is not None:
+            action_name, tables = key_tables
+            fingerprint.update(action_name.encode())
+            for (data_path, array_index), (table, has_modifiers) in sorted(tables.items()):
+                fingerprint.update(repr((data_path, array_index, has_modifiers)).encode())
+                fingerprint.update(table.tobytes())
+            animated_paths |= {data_path for data_path, _ in tables}
+
+        # Transforms without keys stay as they are on every frame
+        if animated_paths.isdisjoint(OBJECT_TRANSFORM_PATHS):
+            fingerprint.update(np.array(obj.matrix_basis, dtype=np.float32).tobytes())
+
+        if obj.type == 'ARMATURE' and obj.pose is not None:
+            update_rest_fingerprint(fingerprint, obj.data)
+
+            animated_bones = {path.split('"]')[0] + '"]' for path in animated_paths if path.startswith("pose.bones[")}
+            for pose_bone in obj.pose.bones:
+                fingerprint.update(repr((pose_bone.name, pose_bone.rotation_mode)).encode())
+                if pose_bone.path_from_id() not in animated_bones:
+                    fingerprint.update(np.array(pose_bone.matrix_basis, dtype=np.float32).tobytes())
+
+    return fingerprint.hexdigest()
+
+
+def get_transform_samples(group, frame_start, frame_end, include_bones=False):
+    """Transform samples for the group covering the frame range.
+
+    Samples taken earlier are reused while the animation fingerprint is
+    unchanged, from memory or, with the disk cache on, mapped from the
+    sidecar files. Only the frames listed by missing_frames need sampling.
+    """
+    rig = group.pinned_rig
+    include_bones = include_bones and rig is not None and rig.type == 'ARMATURE'
+
+    group_id = (group.id_data.name, group.name)
+    fingerprint = _fingerprints.get(group_id)
+    if fingerprint is None:
+        fingerprint = get_animation_fingerprint(group)
+        _fingerprints[group_id] = fingerprint
+    samples = _transform_samples.get(group_id)
+
+    if samples is None or samples.fingerprint != fingerprint:
+        samples = None
+        if group.id_data.bp_com_properties.use_disk_cache:
+            samples = load_transform_samples(group, fingerprint, include_bones)
+
+    if samples is None:
+        samples = TransformSamples(group, fingerprint, frame_start, frame_end, include_bones)
+    else:
+        samples.extend(frame_start, frame_end, include_bones)
+    _transform_samples[group_id] = samples
+
+    return samples
+
+
+@persistent
+def clear_fingerprints(*args):
+    # Any edit can change a fingerprint
+    _fingerprints.clear()
+
+
+@persistent
+def clear_transform_samples(*args):
+    _transform_samples.clear()
+    _fingerprints.clear()
@@ -1,7 +1,9 @@
 import bpy
+from . import jobs
+from .com_cache import find_com_timeline
+from .motion_path import get_pending_indices
 from .utils import (
-    get_inertia_tensor,
-    get_com,
+    compute_mass_properties,
     get_total_mass,
     get_total_mog_mass,
 )
@@ -57,6 +59,10 @@ class BP_PT_MainMenu(BalancePointPanel, bpy.types.Panel):
         col.prop(com_props, "com_drawing_on", toggle=1,
                  icon=draw_icon, text="")
 
+        # Running job
+        if jobs.active_job is not None:
+            layout.progress(factor=jobs.active_job.factor, text=jobs.active_job.format())
+
         # MOG Settings
         if selected_mog is not None:
             row = layout.row()
@@ -88,6 +94,15 @@ class BP_PT_MainMenu(BalancePointPanel, bpy.types.Panel):
             row = layout.row()
             row.prop(selected_mog, "com_location")
             row = layout.row()
+            row.prop(selected_mog, "use_com_cache")
+            if selected_mog.use_com_cache:
+                timeline = find_com_timeline(selected_mog)
+                if timeline is None or not timeline.is_complete:
+                    filled_count = timeline.filled_count if timeline is not None else 0
+                    frame_count = max(scene.frame_end - scene.frame_start + 1, 0)
+                    row.label(text="{}/{} frames".format(filled_count, frame_count))
+                    row.operator("balance_point.fill_com_cache", text="Fill")
+            row = layout.row()
             row.prop(selected_mog, "pinned_rig")
             if selected_mog.pinned_rig is not None and selected_mog.pinned_rig.type == 'ARMATURE':
                 row = layout.row()
@@ -105,6 +120,8 @@ class BP_PT_MainMenu(BalancePointPanel, bpy.types.Panel):
                         row = layout.row()
                         row.prop(
                             selected_mog.pinned_rig.pose.bones[selected_mog.root_bone], "rotation_mode")
+                row = layout.row()
+                row.prop(selected_mog, "use_bone_masses")
             row = layout.row()
             row.prop(selected_mog, "com_object_enabled")
             row = layout.row()
@@ -258,7 +275,7 @@ class BP_PT_RotationAxis(BalancePointPanel, bpy.types.Panel):
             row = layout.row()
             row.alignment = 'CENTER'
             row.label(
-                text=f"Inertia Tensor: {format_matrix(get_inertia_tensor(selected_mog, get_com(selected_mog)))}")
+                text=f"Inertia Tensor: {format_matrix(compute_mass_properties(selected_mog).inertia_tensor)}")
             row = layout.row()
             row.operator("balance_point.align_axis_cursor", icon='CURSOR')
             row.operator("balance_point.align_axis", icon='DOT')
@@ -336,6 +353,13 @@ class BP_PT_Baking(BalancePointPanel, bpy.types.Panel):
                 col.prop(selected_mog, "initial_angular_velocity")
             col.separator()
             col.prop(selected_mog, "substeps")
+            col.prop(selected_mog, "integrator")
+            col.prop(selected_mog, "adaptive_substeps")
+            if selected_mog.adaptive_substeps:
+                col.prop(selected_mog, "substep_tolerance")
+            col.separator()
+            col.prop(scene.bp_com_properties, "frames_per_tick")
+            col.prop(scene.bp_com_properties, "use_disk_cache")
 
             if selected_mog is not None and selected_mog.pinned_rig is not None and selected_mog.root_bone != '':
                 row = layout.row()
@@ -347,6 +371,40 @@ class BP_PT_Baking(BalancePointPanel, bpy.types.Panel):
             row.label(
                 text="Add a Mass Object Collection to begin.")
 
+
+class BP_PT_BatchBaking(BalancePointPanel, bpy.types.Panel):
+    bl_parent_id = "BP_PT_PhysicsTools"
+    bl_label = "Batch Baking"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        mass_object_groups = scene.bp_mass_object_groups
+        selected_index = scene.bp_group_index
+        selected_mog = mass_object_groups[selected_index] if selected_index < len(
+            mass_object_groups) else None
+
+        if selected_mog is not None:
+            layout.prop(selected_mog, "batch_bake")
+            box = layout.box()
+            row = box.row(align=True)
+            row.alignment = 'CENTER'
+            row.label(text="Batch Actions")
+            row.operator("balance_point.batch_action_add",
+                         icon='ADD', text="Add New")
+            row.operator("balance_point.batch_action_remove",
+                         text="", icon='REMOVE')
+            for item in selected_mog.batch_actions:
+                box.prop(item, "action", text="")
+            if len(selected_mog.batch_actions) < 1:
+                box.label(text="Bakes the rig's current action.")
+
+        row = layout.row()
+        row.scale_y = 1.5
+        row.operator("balance_point.bake_physics_batch")
+
+
 class BP_PT_Motion_Path(BalancePointPanel, bpy.types.Panel):
     bl_parent_id = "BP_PT_MainMenu"
     bl_label = "Center of Mass Motion Path"
@@ -365,6 +423,8 @@ class BP_PT_Motion_Path(BalancePointPanel, bpy.types.Panel):
             col = layout.column(align=True)
             col.prop(selected_mog, "motion_path_frame_start")
             col.prop(selected_mog, "motion_path_frame_end", text="End")
+            col.prop(selected_mog, "motion_path_frame_step", text="Step")
+            col.prop(selected_mog, "motion_path_track_edits", text="Track Edits")
             row = layout.row()
             col_l = row.column()
             col_l.operator(
@@ -373,6 +433,11 @@ class BP_PT_Motion_Path(BalancePointPanel, bpy.types.Panel):
             col_r.scale_x = 0.6
             col_r.operator("balance_point.clear_motion_path",
                            text="Clear", icon="PANEL_CLOSE")
+            if selected_mog.motion_path_track_edits:
+                pending_count = len(get_pending_indices(selected_mog))
+                layout.operator("balance_point.update_com_motion_path", icon="FILE_REFRESH",
+                                text="Update Motion Path ({} points)".format(pending_count) if pending_count > 0 else "Update Motion Path")
+            layout.operator("balance_point.export_analysis", icon="EXPORT")
         else:
             row = layout.row()
             row.alignment = 'CENTER'
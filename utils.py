@@ -1,5 +1,17 @@
+from collections import namedtuple
 from mathutils import Vector, Matrix
-import math
+import numpy as np
+from .mass_index import get_mass_index
+
+
+MassProperties = namedtuple("MassProperties", (
+    "total_mass",
+    "com",
+    "inertia_tensor",
+    "principal_moments",
+    "principal_axes",
+))
+
 
 def is_valid_triangle(p1, p2, p3):
     import numpy as np
@@ -24,17 +36,8 @@ def get_triangle_normal(p1, p2, p3):
 
 
 def get_total_mog_mass(group):
-    total_mass = 0
-
-    for mass_collection in group.mass_collections:
-        if mass_collection.mass_object_collection is not None:
-            for obj in mass_collection.mass_object_collection.all_objects:
-                if obj.get("active"):
-                    obj_mass = obj.get("density") * obj.get("volume")
-
-                    total_mass += obj_mass
-
-    return total_mass
+    # Raw mass of the active objects, without collection influence
+    return float(get_mass_index(group).unweighted_masses.sum())
 
 
 def get_total_mass(objects):
@@ -50,93 +53,127 @@ def get_total_mass(objects):
 
 
 def get_inertia_tensor(group, com_vector):
-    I_xx, I_yy, I_zz = 0.0, 0.0, 0.0
-    I_xy, I_xz, I_yz = 0.0, 0.0, 0.0
-
-    for mass_collection in group.mass_collections:
-        if mass_collection.mass_object_collection is not None:
-            for obj in mass_collection.mass_object_collection.all_objects:
-                if obj.get("active"):
-                    vol = obj.get("volume", 0)
-                    m = obj.get("density", 0) * vol * mass_collection.influence
-                    
-                    radius = ((3 * vol) / (4 * math.pi))**(1/3) / 10
-                    i_local = (2/5) * m * (radius**2)
-
-                    r = obj.matrix_world.translation - com_vector
-                    x, y, z = r.x, r.y, r.z
-
-                    I_xx += i_local + m * (y**2 + z**2)
-                    I_yy += i_local + m * (x**2 + z**2)
-                    I_zz += i_local + m * (x**2 + y**2)
-
-                    I_xy -= m * (x * y)
-                    I_xz -= m * (x * z)
-                    I_yz -= m * (y * z)
-
-    return Matrix((
-        (I_xx, I_xy, I_xz),
-        (I_xy, I_yy, I_yz),
-        (I_xz, I_yz, I_zz)
-    ))
+    return MassSnapshot.from_group(group).inertia_tensor(com_vector)
 
 
 def get_com(group):
-    center_of_mass = Vector((0, 0, 0))
-
-    total_mass = 0
-    weighted_sum = Vector((0, 0, 0))
-
-    for mass_collection in group.mass_collections:
-        if mass_collection.mass_object_collection is not None:
-            for obj in mass_collection.mass_object_collection.all_objects:
-                if obj.get("active"):
-                    obj_mass = obj.get("density") * obj.get("volume") * mass_collection.influence
-
-                    total_mass += obj_mass
-                    weighted_sum += (obj_mass * obj.matrix_world.translation)
-
-    if total_mass > 0:
-        center_of_mass = weighted_sum / total_mass
-
-    return center_of_mass
+    return MassSnapshot.from_group(group).com()
+
+
+def compute_mass_properties(group):
+    return MassSnapshot.from_group(group).mass_properties()
+
+
+class MassSnapshot:
+    """Masses, world positions and radii of the active objects in a Mass Object Group."""
+
+    def __init__(self, masses, positions, radii, unweighted_masses=None):
+        self.masses = np.asarray(masses, dtype=np.float64)
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        if unweighted_masses is None:
+            self.unweighted_masses = self.masses
+        else:
+            self.unweighted_masses = np.asarray(unweighted_masses, dtype=np.float64)
+
+    @classmethod
+    def from_group(cls, group):
+        index = get_mass_index(group)
+        return cls(index.masses, index.positions(), index.radii, index.unweighted_masses)
+
+    def __len__(self):
+        return len(self.masses)
+
+    @property
+    def total_mass(self):
+        return float(self.masses.sum())
+
+    def com(self):
+        total_mass = self.total_mass
+        if total_mass > 0:
+            return Vector((self.masses @ self.positions / total_mass).tolist())
+        return Vector((0, 0, 0))
+
+    def inertia_tensor(self, com_vector):
+        r = self.positions - np.asarray(com_vector, dtype=np.float64)
+        second_moment = (r * self.masses[:, None]).T @ r
+        sphere_moment = ((2/5) * self.masses * self.radii**2).sum()
+        tensor = (np.trace(second_moment) + sphere_moment) * np.eye(3) - second_moment
+        return Matrix(tensor.tolist())
+
+    def mass_properties(self):
+        total_mass = self.total_mass
+        if total_mass <= 0:
+            return MassProperties(0.0, Vector((0, 0, 0)), Matrix.Diagonal((0, 0, 0)), Vector((0, 0, 0)), Matrix.Identity(3))
+
+        # First and second moments about the world origin, moved to the COM
+        # with the parallel axis theorem.
+        first_moment = self.masses @ self.positions
+        second_moment = (self.positions * self.masses[:, None]).T @ self.positions
+        com = first_moment / total_mass
+        second_moment -= total_mass * np.outer(com, com)
+
+        sphere_moment = ((2/5) * self.masses * self.radii**2).sum()
+        tensor = (np.trace(second_moment) + sphere_moment) * np.eye(3) - second_moment
+        principal_moments, principal_axes = np.linalg.eigh(tensor)
+
+        return MassProperties(
+            total_mass,
+            Vector(com.tolist()),
+            Matrix(tensor.tolist()),
+            Vector(principal_moments.tolist()),
+            Matrix(principal_axes.tolist()))
 
 
 def projectile_position_linear(start_pos, second_pos, gravity, time_of_flight, elapsed_time, drag_vector):
-    x0, y0, z0 = start_pos
-    x1, y1, z1 = second_pos
-    
-    kx, ky, kz = drag_vector
-    
-    T = time_of_flight
-    t = elapsed_time
-    g = gravity
-    
-    if kx < 1e-5:
-        v0x = (x1 - x0) / T
-        x = x0 + v0x * t
-    else:
-        den_x = 1.0 - math.exp(-kx * T)
-        loss_tx = 1.0 - math.exp(-kx * t)
-        v0x = (kx * (x1 - x0)) / den_x
-        x = x0 + (v0x / kx) * loss_tx
-
-    if ky < 1e-5:
-        v0y = (y1 - y0) / T
-        y = y0 + v0y * t
-    else:
-        den_y = 1.0 - math.exp(-ky * T)
-        loss_ty = 1.0 - math.exp(-ky * t)
-        v0y = (ky * (y1 - y0)) / den_y
-        y = y0 + (v0y / ky) * loss_ty
-
-    if kz < 1e-5:
-        v0z = (z1 - z0) / T + 0.5 * g * T
-        z = z0 + v0z * t - 0.5 * g * t**2
-    else:
-        den_z = 1.0 - math.exp(-kz * T)
-        loss_tz = 1.0 - math.exp(-kz * t)
-        v0z = (kz * (z1 - z0) + g * T) / den_z - (g / kz)
-        z = z0 + ((v0z + g / kz) / kz) * loss_tz - (g * t) / kz
-
-    return Vector((x, y, z))
\ No newline at end of file
+    trajectory = BallisticTrajectory(start_pos, second_pos, gravity, time_of_flight, drag_vector)
+    return Vector(trajectory.positions(elapsed_time)[0].tolist())
+
+
+class BallisticTrajectory:
+    """Projectile curve through a start and reference point with linear drag.
+
+    Every axis is evaluated as p0 + A * (1 - exp(-k * t)) + B * t + C * t^2,
+    with the coefficients solved once so that the curve reaches the
+    reference point after time_of_flight seconds.
+    """
+
+    def __init__(self, start_pos, second_pos, gravity, time_of_flight, drag_vector):
+        p0 = np.array(start_pos[:3], dtype=np.float64)
+        p1 = np.array(second_pos[:3], dtype=np.float64)
+        k = np.array(drag_vector[:3], dtype=np.float64)
+        T = float(time_of_flight)
+        g = np.array((0.0, 0.0, gravity), dtype=np.float64)
+
+        damped = k >= 1e-5
+        safe_k = np.where(damped, k, 1.0)
+
+        # Undamped axes
+        A = np.zeros(3)
+        B = (p1 - p0) / T + 0.5 * g * T
+        C = -0.5 * g
+
+        # Damped axes
+        v0 = (safe_k * (p1 - p0) + g * T) / (1.0 - np.exp(-safe_k * T)) - g / safe_k
+        A = np.where(damped, (v0 + g / safe_k) / safe_k, A)
+        B = np.where(damped, -g / safe_k, B)
+        C = np.where(damped, 0.0, C)
+
+        self.start = p0
+        self.k = np.where(damped, k, 0.0)
+        self.A = A
+        self.B = B
+        self.C = C
+
+    def positions(self, times):
+        t = np.atleast_1d(np.asarray(times, dtype=np.float64))[:, None]
+        loss = 1.0 - np.exp(-self.k * t)
+        return self.start + self.A * loss + self.B * t + self.C * t**2
+
+    def velocities(self, times):
+        t = np.atleast_1d(np.asarray(times, dtype=np.float64))[:, None]
+        return self.A * self.k * np.exp(-self.k * t) + self.B + 2 * self.C * t
+
+    def accelerations(self, times):
+        t = np.atleast_1d(np.asarray(times, dtype=np.float64))[:, None]
+        return -self.A * self.k**2 * np.exp(-self.k * t) + 2 * self.C